@@ -0,0 +1,188 @@
+from app import app, db
+from models import Job, WorkOrder, Operation, PurchaseOrder, JobArchive, WorkOrderArchive, OperationArchive
+from cache import bump_data_version
+from snapshot import refresh_snapshot
+from sqlalchemy import delete, exists, false, func, insert, literal, or_, select, true, union_all
+from datetime import datetime, timedelta
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 5000  # Operations moved per transaction
+
+# Columns operation and operation_archive share, in operation_history's order
+HISTORY_COLUMNS = ['id', 'work_order_id', 'operation_number', 'work_center', 'planned_hours', 'actual_hours',
+                   'status', 'scheduled_date', 'schedule_version', 'completed_at', 'row_hash', 'created_at']
+
+
+def history_query():
+    """Hot and archived operations as one UNION ALL, with an ``archived`` flag"""
+    return union_all(
+        select(*[Operation.__table__.c[column] for column in HISTORY_COLUMNS], false().label('archived')),
+        select(*[OperationArchive.__table__.c[column] for column in HISTORY_COLUMNS], true().label('archived')),
+    )
+
+
+# Every operation ever imported; query its columns (operation_history.c.work_center, ...)
+# wherever history matters more than the hot table. Migrations also create it as a view.
+operation_history = history_query().subquery('operation_history')
+
+
+def _archivable(cutoff):
+    # Operations marked Completed without a completion time age from when they were imported
+    return ((Operation.status == 'Completed')
+            & (func.coalesce(Operation.completed_at, Operation.created_at) < cutoff))
+
+
+def _archive_parents(work_order_ids, now):
+    """Move the given work orders once they have no operations or purchase orders, then their empty jobs"""
+    empty_work_orders = db.session.execute(
+        select(WorkOrder.id, WorkOrder.job_id)
+        .where(WorkOrder.id.in_(work_order_ids),
+               ~exists().where(Operation.work_order_id == WorkOrder.id),
+               ~exists().where(PurchaseOrder.work_order_id == WorkOrder.id))).all()
+    if not empty_work_orders:
+        return 0, 0
+    ids = [wo_id for wo_id, _ in empty_work_orders]
+    db.session.execute(insert(WorkOrderArchive).from_select(
+        ['id', 'work_order_number', 'job_id', 'created_at', 'archived_at'],
+        select(WorkOrder.id, WorkOrder.work_order_number, WorkOrder.job_id, WorkOrder.created_at, literal(now))
+        .where(WorkOrder.id.in_(ids))))
+    db.session.execute(delete(WorkOrder).where(WorkOrder.id.in_(ids)))
+
+    empty_jobs = db.session.execute(
+        select(Job.id).where(Job.id.in_({job_id for _, job_id in empty_work_orders}),
+                             ~exists().where(WorkOrder.job_id == Job.id))).scalars().all()
+    if empty_jobs:
+        db.session.execute(insert(JobArchive).from_select(
+            ['id', 'job_number', 'created_at', 'archived_at'],
+            select(Job.id, Job.job_number, Job.created_at, literal(now)).where(Job.id.in_(empty_jobs))))
+        db.session.execute(delete(Job).where(Job.id.in_(empty_jobs)))
+    return len(ids), len(empty_jobs)
+
+
+def _archive_batch(batch, now):
+    """Move one batch of ``(operation id, work order id)`` into the archive, with the parents it empties"""
+    ids = [op_id for op_id, _ in batch]
+    db.session.execute(insert(OperationArchive).from_select(
+        HISTORY_COLUMNS + ['work_order_number', 'archived_at'],
+        select(*[Operation.__table__.c[column] for column in HISTORY_COLUMNS], WorkOrder.work_order_number,
+               literal(now))
+        .join(WorkOrder, Operation.work_order_id == WorkOrder.id)
+        .where(Operation.id.in_(ids))))
+    db.session.execute(delete(Operation).where(Operation.id.in_(ids)))
+    return _archive_parents({wo_id for _, wo_id in batch}, now)
+
+
+def archive_completed(retention_days=None, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Move completed operations older than the retention window out of the hot tables.
+
+    Operations with status Completed whose ``completed_at`` is more than
+    ``retention_days`` (default ARCHIVE_RETENTION_DAYS) ago go to
+    operation_archive, followed by the work orders and jobs left without
+    operations. Work orders that purchase orders still point at stay. Each
+    batch is its own transaction, so a large backlog can be archived while
+    the app is running. The rollup already counts archived operations and is
+    left as it is. Returns the number of operations, work orders and jobs
+    moved, or with ``dry_run`` just the operations that would be.
+    """
+    days = app.config.get('ARCHIVE_RETENTION_DAYS', 365) if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = {'operations': 0, 'work_orders': 0, 'jobs': 0}
+    if dry_run:
+        result['operations'] = db.session.scalar(select(func.count(Operation.id)).where(_archivable(cutoff)))
+        return result
+
+    now = datetime.utcnow()
+    while True:
+        batch = db.session.execute(
+            select(Operation.id, Operation.work_order_id).where(_archivable(cutoff))
+            .order_by(Operation.id).limit(batch_size)).all()
+        if not batch:
+            break
+        try:
+            work_orders, jobs = _archive_batch(batch, now)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Archiving stopped after {result['operations']} operations: {str(e)}")
+            raise
+        result['operations'] += len(batch)
+        result['work_orders'] += work_orders
+        result['jobs'] += jobs
+
+    if result['operations']:
+        bump_data_version()
+        refresh_snapshot()
+    logger.info(f"🗄️ Archived {result['operations']} operations completed before {cutoff:%Y-%m-%d}, "
+                f"{result['work_orders']} work orders and {result['jobs']} jobs")
+    return result
+
+
+def archived_operation_keys(work_order_numbers):
+    """``(work_order_number, operation_number)`` of the archived operations of these work orders"""
+    if not work_order_numbers:
+        return set()
+    return set(db.session.execute(
+        select(OperationArchive.work_order_number, OperationArchive.operation_number)
+        .where(OperationArchive.work_order_number.in_(work_order_numbers))).all())
+
+
+def restore_parents(job_numbers, work_order_numbers):
+    """Move archived jobs and work orders back to the hot tables, ids unchanged, so new operations can use them.
+
+    A restored work order brings its job back with it. Call within the
+    import's transaction, before inserting the jobs and work orders it lacks.
+    """
+    work_orders = db.session.execute(
+        select(WorkOrderArchive.id, WorkOrderArchive.job_id)
+        .where(WorkOrderArchive.work_order_number.in_(work_order_numbers))).all()
+    jobs = or_(JobArchive.job_number.in_(job_numbers), JobArchive.id.in_({job_id for _, job_id in work_orders}))
+    restored_jobs = db.session.execute(insert(Job).from_select(
+        ['id', 'job_number', 'created_at'],
+        select(JobArchive.id, JobArchive.job_number, JobArchive.created_at).where(jobs))).rowcount
+    if restored_jobs:
+        db.session.execute(delete(JobArchive).where(jobs))
+    if work_orders:
+        ids = [wo_id for wo_id, _ in work_orders]
+        db.session.execute(insert(WorkOrder).from_select(
+            ['id', 'work_order_number', 'job_id', 'created_at'],
+            select(WorkOrderArchive.id, WorkOrderArchive.work_order_number, WorkOrderArchive.job_id,
+                   WorkOrderArchive.created_at).where(WorkOrderArchive.id.in_(ids))))
+        db.session.execute(delete(WorkOrderArchive).where(WorkOrderArchive.id.in_(ids)))
+    if restored_jobs or work_orders:
+        logger.info(f"♻️ Restored {len(work_orders)} work orders and {restored_jobs} jobs from the archive")
+
+
+def archived_completions(work_center=None):
+    """Archived completed operations summed per work center and completion day.
+
+    Rows are ``(work_center, status, planned_hours, actual_hours,
+    scheduled_date, completed_at)`` like ``forecasting.operations_frame``
+    takes. Efficiency history only needs hours per week, so day totals give
+    the forecasts the same result as every archived row would.
+    """
+    day = func.date(OperationArchive.completed_at)
+    query = (select(OperationArchive.work_center, OperationArchive.status,
+                    func.sum(OperationArchive.planned_hours),
+                    func.coalesce(func.sum(OperationArchive.actual_hours), 0.0),
+                    literal(None), day)
+             .where(OperationArchive.status == 'Completed')
+             .group_by(OperationArchive.work_center, OperationArchive.status, day))
+    if work_center:
+        query = query.where(OperationArchive.work_center == work_center)
+    return db.session.execute(query).all()
+
+
+@app.cli.command('archive-completed')
+@click.option('--days', type=int, default=None, help='Retention window in days (default ARCHIVE_RETENTION_DAYS).')
+@click.option('--dry-run', is_flag=True, help='Only count the operations that would be archived.')
+def archive_completed_command(days, dry_run):
+    """Move completed operations past the retention window into the archive tables."""
+    result = archive_completed(retention_days=days, dry_run=dry_run)
+    if dry_run:
+        click.echo(f"{result['operations']} operations would be archived")
+    else:
+        click.echo(f"Archived {result['operations']} operations, {result['work_orders']} work orders "
+                   f"and {result['jobs']} jobs")
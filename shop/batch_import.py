@@ -0,0 +1,117 @@
+from app import app
+from importer import COLUMN_MAPPINGS, KEY_COLUMNS, normalize_frame, normalize_purchase_orders
+from excel_reader import read_sheet, sheet_names
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.utils import secure_filename
+import multiprocessing
+import pandas as pd
+import logging
+import zipfile
+import time
+import uuid
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def expand_uploads(uploads, folder):
+    """``(path, name)`` of every workbook among saved uploads, extracting the .xlsx members of .zip files.
+
+    Archive members come out in name order, next to the archive's place in
+    ``uploads``. Returns the workbooks and the extracted paths to clean up.
+    """
+    workbooks, extracted = [], []
+    for path, name in uploads:
+        if not name.lower().endswith('.zip'):
+            workbooks.append((path, name))
+            continue
+        with zipfile.ZipFile(path) as archive:
+            members = sorted((info for info in archive.infolist() if not info.is_dir()), key=lambda info: info.filename)
+            for info in members:
+                member = os.path.basename(info.filename)
+                if not member.lower().endswith('.xlsx') or member.startswith(('~$', '._')):
+                    continue  # Folders, other files, Excel lock files and macOS metadata
+                target = os.path.join(folder, f"{uuid.uuid4().hex}_{secure_filename(member)}")
+                with archive.open(info) as source, open(target, 'wb') as out:
+                    while block := source.read(1024 * 1024):
+                        out.write(block)
+                extracted.append(target)
+                workbooks.append((target, f"{name}/{info.filename}"))
+    return workbooks, extracted
+
+
+def parse_sheet(path, sheet_index, source):
+    """Read and normalize one sheet; runs in a worker process, so it only touches files, never the database"""
+    df = read_sheet(path, sheet_index)
+    if not any(alias in df.columns for alias in COLUMN_MAPPINGS['job_number']):
+        return {'source': source, 'rows': 0, 'span': 0, 'clean': None, 'rejects': [], 'orders': None}
+    clean, rejects = normalize_frame(df)
+    return {
+        'source': source,
+        'rows': len(df),
+        'span': int(df.index.max()) + 1 if len(df) else 0,  # Row numbers used, counting skipped blank rows
+        'clean': clean,
+        'rejects': rejects,
+        'orders': normalize_purchase_orders(df),
+    }
+
+
+def parse_workbooks(workbooks, processes=None):
+    """Parse every sheet of every workbook, in parallel across processes; results keep upload order.
+
+    Workers start from a fresh interpreter ("spawn") rather than forking a
+    threaded web worker, and the pool lives only as long as the batch, so
+    idle imports cost no memory. A single sheet is parsed in-process.
+    """
+    tasks = []
+    for path, name in workbooks:
+        sheets = sheet_names(path)
+        tasks.extend((path, index, f"{name}/{sheet}" if len(sheets) > 1 else name)
+                     for index, sheet in enumerate(sheets))
+    processes = min(processes or app.config.get('IMPORT_PROCESSES') or os.cpu_count() or 1, len(tasks))
+    started = time.perf_counter()
+    if processes <= 1:
+        parsed = [parse_sheet(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            # map() returns results in task order whichever worker finishes first
+            parsed = list(pool.map(parse_sheet, *zip(*tasks)))
+    logger.info(f"📑 Parsed {len(tasks)} sheets from {len(workbooks)} workbooks with {processes} processes "
+                f"in {time.perf_counter() - started:.1f}s")
+    return parsed
+
+
+def merge_sheets(parsed):
+    """Combine parsed sheets into one normalized batch for ``importer.import_batches``.
+
+    Sheets are taken in upload order and, as within a sheet, the last
+    occurrence of a job/operation key or PO number wins, so the result never
+    depends on which worker finished first. Row numbers run on from sheet to
+    sheet as if the batch were one export; rejects also name their sheet.
+    """
+    cleans, orders, rejects = [], [], []
+    rows = offset = 0
+    for sheet in parsed:
+        rows += sheet['rows']
+        rejects.extend({**reject, 'row': reject['row'] + offset, 'source': sheet['source'],
+                        'source_row': reject['row']} for reject in sheet['rejects'])
+        if sheet['clean'] is None:
+            logger.info(f"⏭️ {sheet['source']} has no order column, skipping")
+            continue
+        cleans.append(sheet['clean'].set_axis(sheet['clean'].index + offset))
+        orders.append(sheet['orders'].set_axis(sheet['orders'].index + offset))
+        offset += sheet['span']
+
+    if not cleans:
+        clean, _ = normalize_frame(pd.DataFrame())
+        return rows, clean, rejects, normalize_purchase_orders(pd.DataFrame())
+
+    clean = pd.concat(cleans)
+    repeated = clean.duplicated(subset=KEY_COLUMNS, keep=False)
+    if repeated.any():
+        versions = clean[repeated].groupby(KEY_COLUMNS)['row_hash'].nunique()
+        logger.warning(f"⚠️ {len(versions)} operations appear in more than one sheet, {int((versions > 1).sum())} "
+                       f"with different values; the last sheet's values were kept")
+        clean = clean.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+    purchase_orders = pd.concat(orders).drop_duplicates(subset=['po_number'], keep='last')
+    return rows, clean, rejects, purchase_orders
@@ -0,0 +1,115 @@
+from benchmarks.generator import ALIAS_STYLES, write_sap_export
+from benchmarks.results import DEFAULT_THRESHOLD, build_results, compare_results, load_results, save_results
+from benchmarks.suite import SHOP_DIR, measure_startup
+from sqlalchemy.engine import make_url
+import subprocess
+import tempfile
+import logging
+import click
+import json
+import sys
+import os
+
+
+def scale_options(command):
+    """Options shared by every command that generates SAP data"""
+    options = [
+        click.option('--jobs', default=1000, show_default=True, help='Orders in the export.'),
+        click.option('--operations-per-order', default=8, show_default=True),
+        click.option('--work-centers', default=40, show_default=True),
+        click.option('--dirty-fraction', default=0.01, show_default=True, help='Numeric cells holding junk text.'),
+        click.option('--missing-fraction', default=0.01, show_default=True, help='Key and hours cells left empty.'),
+        click.option('--purchase-fraction', default=0.1, show_default=True, help='Rows carrying a purchase order.'),
+        click.option('--alias-style', type=click.Choice(ALIAS_STYLES), default='sap', show_default=True),
+        click.option('--seed', default=0, show_default=True),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+@click.group()
+def cli():
+    """Benchmarks for the SAP importer, analytics and API routes."""
+
+
+@cli.command()
+@click.argument('path')
+@scale_options
+def generate(path, **scale):
+    """Write a synthetic SAP export to PATH (.xlsx)."""
+    df = write_sap_export(path, **scale)
+    click.echo(f"Wrote {len(df)} rows to {path}")
+
+
+@cli.command()
+@click.option('--database', 'databases', multiple=True,
+              help='Scratch database URL; repeat to compare several. Default: a temporary SQLite file.')
+@click.option('--rounds', default=5, show_default=True, help='Timed rounds per benchmark.')
+@click.option('--startup-rounds', default=5, show_default=True, help='Cold starts to time; 0 to skip.')
+@click.option('--output', default='benchmark-results.json', show_default=True)
+@scale_options
+def run(databases, rounds, startup_rounds, output, **scale):
+    """Run the suite against each database and save the timings as JSON."""
+    folder = tempfile.mkdtemp(prefix='shop-bench-')
+    databases = list(databases) or [f"sqlite:///{os.path.join(folder, 'bench.db')}"]
+    benchmarks = {}
+    startup_modules = None
+
+    if startup_rounds:
+        timings, startup_modules = measure_startup(databases[0], rounds=startup_rounds)
+        benchmarks.update(timings)
+        click.echo(f"startup: {timings['startup.import_main']['median'] * 1000:.0f} ms to import main, "
+                   f"heavy modules loaded: {', '.join(startup_modules) or 'none'}")
+
+    for url in databases:
+        dialect = make_url(url).get_backend_name()
+        path = os.path.join(folder, f'{dialect}.json')
+        # A process per database, since the app binds its database once
+        subprocess.run([sys.executable, '-m', 'benchmarks', 'run-database', url, '--rounds', str(rounds),
+                        '--scale', json.dumps(scale), '--output', path], cwd=SHOP_DIR, check=True)
+        with open(path) as f:
+            for name, timings in json.load(f).items():
+                benchmarks[f'{dialect}/{name}'] = timings
+                click.echo(f"{dialect}/{name}: {timings['median'] * 1000:.1f} ms")
+
+    databases = [make_url(url).render_as_string(hide_password=True) for url in databases]
+    save_results(build_results(benchmarks, scale, rounds, databases, startup_modules), output)
+    click.echo(f"Saved results to {output}")
+
+
+@cli.command('run-database', hidden=True)
+@click.argument('database')
+@click.option('--rounds', default=5)
+@click.option('--scale', default='{}')
+@click.option('--output', required=True)
+def run_database_command(database, rounds, scale, output):
+    """Run the suite in this process against one database (used by ``run``)."""
+    from benchmarks.suite import run_database
+    logging.getLogger().setLevel(logging.ERROR)  # Every round logs an import summary otherwise
+    with open(output, 'w') as f:
+        json.dump(run_database(database, json.loads(scale), rounds=rounds), f)
+
+
+@cli.command()
+@click.argument('baseline')
+@click.argument('current')
+@click.option('--threshold', default=DEFAULT_THRESHOLD, show_default=True,
+              help='Fractional change in the median that counts as a regression.')
+def compare(baseline, current, threshold):
+    """Compare two results files; exits with status 1 if anything got slower."""
+    rows = compare_results(load_results(baseline), load_results(current), threshold)
+    width = max((len(name) for name, *_ in rows), default=10)
+
+    def ms(value):
+        return f'{value * 1000:10.1f}' if value is not None else f"{'-':>10}"
+
+    click.echo(f"{'benchmark':<{width}} {'base ms':>10} {'new ms':>10}  ratio")
+    for name, old, new, ratio, verdict in rows:
+        click.echo(f"{name:<{width}} {ms(old)} {ms(new)}  {f'{ratio:.2f}' if ratio else '    -'}  {verdict}")
+    if any(verdict == 'slower' for *_, verdict in rows):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    cli()
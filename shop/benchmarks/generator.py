@@ -0,0 +1,94 @@
+from importer import COLUMN_MAPPINGS, PURCHASE_COLUMN_MAPPINGS
+from models import PURCHASE_STATUSES
+import numpy as np
+import pandas as pd
+
+# COLUMN_MAPPINGS lists each column's SAP, upper-case and plain spelling, in that order
+ALIAS_STYLES = ['sap', 'upper', 'plain']
+
+DIRTY_NUMBERS = ['n/a', '#VALUE!', '1,5', '-', '?']
+DESCRIPTIONS = ['Dismantling & Inspection', 'Machining', 'Assembly', 'Balancing', 'Test & Paint']
+
+
+def column_name(field, alias_style='sap'):
+    """Header the generator uses for ``field`` in the given alias style"""
+    aliases = COLUMN_MAPPINGS.get(field) or PURCHASE_COLUMN_MAPPINGS[field]
+    return aliases[min(ALIAS_STYLES.index(alias_style), len(aliases) - 1)]
+
+
+def _headers(style, mappings):
+    """Column name for each field in the given alias style; fields sharing a name share a column"""
+    return {field: column_name(field, style) for field in mappings}
+
+
+def _soil(values, rng, fraction, replacements):
+    """Replace a random ``fraction`` of ``values`` with picks from ``replacements``"""
+    values = values.astype(object)
+    hit = rng.random(len(values)) < fraction
+    values[hit] = rng.choice(np.array(replacements, dtype=object), hit.sum())
+    return values
+
+
+def generate_sap_export(jobs=1000, operations_per_order=8, work_centers=40, dirty_fraction=0.01,
+                        missing_fraction=0.01, purchase_fraction=0.0, alias_style='sap', seed=0):
+    """A synthetic SAP export shaped like SAPDATA.xlsx, at any scale.
+
+    Each job is one order with ``operations_per_order`` operations numbered
+    10, 20, ... spread over ``work_centers`` work centers. About
+    ``dirty_fraction`` of the numeric cells hold unparseable text and
+    ``missing_fraction`` of the key and hours cells are empty, so some rows
+    are rejected the way real exports' are. ``purchase_fraction`` of the rows
+    carry a purchase order. Column headers use the ``alias_style`` spelling
+    from ``COLUMN_MAPPINGS``. The same arguments always give the same frame,
+    except that delivery dates are relative to today.
+    """
+    rng = np.random.default_rng(seed)
+    rows = jobs * operations_per_order
+    job_index = np.repeat(np.arange(jobs), operations_per_order)
+
+    orders = 4000000 + job_index
+    operation_numbers = np.tile(np.arange(1, operations_per_order + 1) * 10, jobs)
+    centers = np.array([f'WC{i:03d}' for i in range(work_centers)], dtype=object)[
+        rng.integers(0, work_centers, rows)]
+    planned = np.round(rng.gamma(2.0, 3.0, rows), 1)
+    progress = np.where(rng.random(rows) < 0.4, 0.0, rng.uniform(0.0, 1.3, rows))
+    actual = np.round(planned * progress, 2)
+
+    headers = _headers(alias_style, COLUMN_MAPPINGS)
+    columns = {
+        'Sales Document': 100000000 + job_index // 3,
+        headers['job_number']: _soil(orders, rng, missing_fraction, [None]),
+        headers['operation_number']: _soil(_soil(operation_numbers, rng, dirty_fraction, DIRTY_NUMBERS),
+                                           rng, missing_fraction, [None]),
+        headers['work_center']: _soil(centers, rng, missing_fraction, [None, '  ']),
+        'Description': np.array(DESCRIPTIONS, dtype=object)[job_index % len(DESCRIPTIONS)],
+        headers['planned_hours']: _soil(_soil(planned, rng, dirty_fraction, DIRTY_NUMBERS),
+                                        rng, missing_fraction, [None]),
+        headers['actual_hours']: _soil(_soil(actual, rng, dirty_fraction, DIRTY_NUMBERS),
+                                       rng, missing_fraction, [None]),
+    }
+    # The plain style names the work order column separately from the job column
+    columns.setdefault(headers['work_order_number'], orders)
+
+    if purchase_fraction:
+        po_headers = _headers(alias_style, PURCHASE_COLUMN_MAPPINGS)
+        has_po = rng.random(rows) < purchase_fraction
+        columns.update({
+            po_headers['po_number']: np.where(has_po, (4500000000 + np.arange(rows)).astype(str), None),
+            po_headers['material']: np.where(has_po, [f'MAT{i:05d}' for i in rng.integers(0, 5000, rows)], None),
+            po_headers['quantity']: np.where(has_po, rng.integers(1, 50, rows), None),
+            po_headers['value']: np.where(has_po, np.round(rng.uniform(10, 20000, rows), 2), None),
+            po_headers['delivery_date']: np.where(
+                has_po, pd.Timestamp.today().normalize() + pd.to_timedelta(rng.integers(-30, 90, rows), unit='D'),
+                pd.NaT),
+            po_headers['status']: np.where(has_po, rng.choice(PURCHASE_STATUSES, rows), None),
+        })
+
+    return pd.DataFrame(columns)
+
+
+def write_sap_export(path, **kwargs):
+    """Write ``generate_sap_export(**kwargs)`` to an .xlsx file and return the frame"""
+    df = generate_sap_export(**kwargs)
+    df.to_excel(path, index=False, engine='openpyxl')
+    return df
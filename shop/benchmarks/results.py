@@ -0,0 +1,76 @@
+from datetime import datetime
+import subprocess
+import platform
+import json
+
+RESULTS_FORMAT = 1
+
+# A benchmark whose median moves by less than this fraction counts as unchanged
+DEFAULT_THRESHOLD = 0.10
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_results(benchmarks, scale, rounds, databases, startup_modules=None):
+    """A results document: run metadata plus ``{name: timings}`` for every benchmark.
+
+    Names are prefixed with the database dialect they ran against (``sqlite/...``),
+    so one file can hold runs against several databases.
+    """
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.utcnow().isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'databases': databases,
+        'scale': scale,
+        'rounds': rounds,
+        'startup_modules': startup_modules,
+        'benchmarks': dict(sorted(benchmarks.items())),
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path} is not a results file in format {RESULTS_FORMAT}")
+    return results
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Compare median timings; returns rows of (name, baseline, current, ratio, verdict).
+
+    The verdict is 'slower' or 'faster' when the median moved by more than
+    ``threshold``, 'new' or 'missing' for benchmarks in only one file, else ''.
+    """
+    rows = []
+    before, after = baseline['benchmarks'], current['benchmarks']
+    for name in sorted(set(before) | set(after)):
+        if name not in before:
+            rows.append((name, None, after[name]['median'], None, 'new'))
+            continue
+        if name not in after:
+            rows.append((name, before[name]['median'], None, None, 'missing'))
+            continue
+        old, new = before[name]['median'], after[name]['median']
+        ratio = new / old if old else None
+        verdict = ''
+        if ratio is not None and ratio > 1 + threshold:
+            verdict = 'slower'
+        elif ratio is not None and ratio < 1 - threshold:
+            verdict = 'faster'
+        rows.append((name, old, new, ratio, verdict))
+    return rows
@@ -0,0 +1,187 @@
+from app import create_app, db
+from benchmarks.generator import column_name, generate_sap_export, write_sap_export
+from datetime import date, timedelta
+import statistics
+import subprocess
+import tempfile
+import logging
+import time
+import json
+import sys
+import io
+import os
+
+logger = logging.getLogger(__name__)
+
+BATCH_PLANTS = 4  # Workbooks in the batch import benchmark
+
+SHOP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: how long until a worker can answer its first request
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+status = main.app.test_client().get('/metrics').status_code
+print(json.dumps({'import': imported - started, 'first_request': time.perf_counter() - imported, 'status': status,
+                  'heavy_modules': sorted(m for m in ('pandas', 'numpy', 'openpyxl') if m in sys.modules)}))
+"""
+
+
+def summarize(timings):
+    """Summary statistics, in seconds, of one benchmark's timed rounds"""
+    return {
+        'rounds': len(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'mean': statistics.fmean(timings),
+        'median': statistics.median(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def measure(fn, rounds=5, warmup=1, setup=None):
+    """Time ``fn`` for ``rounds`` runs after ``warmup`` untimed ones; ``setup`` runs untimed before each"""
+    timings = []
+    for i in range(warmup + rounds):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        if i >= warmup:
+            timings.append(elapsed)
+    return summarize(timings)
+
+
+def measure_startup(database_url, rounds=5):
+    """Cold-start timings of ``main`` in fresh interpreters, plus the heavy modules it loaded"""
+    env = {**os.environ, 'DATABASE_URL': database_url}
+    walls, imports, first_requests = [], [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=SHOP_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        walls.append(time.perf_counter() - started)
+        sample = json.loads(output.strip().splitlines()[-1])
+        imports.append(sample['import'])
+        first_requests.append(sample['first_request'])
+    results = {
+        'startup.process': summarize(walls),
+        'startup.import_main': summarize(imports),
+        'startup.first_request': summarize(first_requests),
+    }
+    return results, sample['heavy_modules']
+
+
+def _reset_database():
+    from schema import drop_schema, upgrade_schema
+    drop_schema()
+    upgrade_schema()
+
+
+def _check(response):
+    response.get_data()  # Streamed bodies are only produced as they are read
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.path} returned {response.status_code}")
+    return response
+
+
+def route_benchmarks(client, work_center, operation_id, workbook):
+    """(name, callable) for each /api/* route.
+
+    /api/stream never finishes and /api/imports/<id> is a single-row lookup,
+    so both are left out.
+    """
+    today = date.today()
+    window = f'start={today}&end={today + timedelta(days=42)}'
+    gets = ['/api/jobs', '/api/jobs?format=columns', '/api/jobs?limit=100',
+            f'/api/jobs?work_center={work_center}&limit=100',
+            '/api/forecast', '/api/forecast?detail=1', f'/api/forecast?work_center={work_center}',
+            '/api/work_centers', '/api/schedule', f'/api/schedule?{window}', f'/api/schedule?{window}&format=columns',
+            '/api/purchase']
+    routes = [(f'GET {url}', lambda url=url: client.get(url)) for url in gets]
+    routes += [
+        ('POST /api/schedule/auto dry_run', lambda: client.post('/api/schedule/auto', json={'dry_run': True})),
+        ('POST /api/schedule/update', lambda: client.post('/api/schedule/update', json={
+            'changes': [{'operation_id': operation_id, 'date': str(today)}]})),
+        ('POST /api/preview', lambda: client.post('/api/preview?jobs=1', content_type='multipart/form-data',
+                                                  data={'file': (io.BytesIO(workbook), 'bench.xlsx')})),
+    ]
+    return routes
+
+
+def run_database(database_url, scale, rounds=5):
+    """Run the suite against one scratch database; returns {benchmark name: timings}.
+
+    The database must hold no operations: its tables are dropped and
+    recreated between import rounds. Raises if a hot path's query plan scans
+    a table in full (see query_plans.py).
+    """
+    folder = tempfile.mkdtemp(prefix='shop-bench-')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'RESPONSE_CACHE_ENABLED': False,  # Measure the work, not cache hits
+        'SNAPSHOT_FOLDER': os.path.join(folder, 'snapshots'),
+        'UPLOAD_FOLDER': os.path.join(folder, 'uploads'),
+        'METRICS_FOLDER': os.path.join(folder, 'metrics'),
+    })
+    from schema import upgrade_schema
+    from models import Operation
+    from utils import process_sapdata, calculate_forecast
+    from excel_processor import process_sap_data
+    from scheduler import auto_schedule
+    from batch_import import parse_workbooks
+    from query_plans import full_scans
+
+    results = {}
+    with app.app_context():
+        upgrade_schema()
+        if db.session.execute(db.select(Operation.id).limit(1)).first():
+            raise ValueError("The database already has operations; benchmark a scratch database instead")
+
+        df = generate_sap_export(**scale)
+        modified = df.copy()
+        # Re-import with one row in twenty changed
+        planned = column_name('planned_hours', scale.get('alias_style', 'sap'))
+        modified[planned] = [value + 1 if isinstance(value, float) and i % 20 == 0 else value
+                             for i, value in enumerate(modified[planned])]
+
+        results['process_sap_data'] = measure(lambda: list(process_sap_data(df)['jobs']), rounds)
+        results['process_sapdata.initial'] = measure(lambda: process_sapdata(df), rounds, setup=_reset_database)
+        results['process_sapdata.unchanged'] = measure(lambda: process_sapdata(df), rounds)
+        results['process_sapdata.modified'] = measure(
+            lambda: process_sapdata(modified), rounds, setup=lambda: process_sapdata(df))
+
+        operations = Operation.query.all()
+        results['calculate_forecast'] = measure(lambda: calculate_forecast(operations), rounds)
+
+        auto_schedule()
+        work_center, operation_id = db.session.execute(
+            db.select(Operation.work_center, Operation.id).limit(1)).one()
+        workbook_path = os.path.join(folder, 'preview.xlsx')
+        write_sap_export(workbook_path, **{**scale, 'jobs': min(scale.get('jobs', 1000), 1000)})
+        with open(workbook_path, 'rb') as f:
+            workbook = f.read()
+
+        # One export per plant, parsed in parallel by the batch importer
+        plants = []
+        for plant in range(BATCH_PLANTS):
+            path = os.path.join(folder, f'plant{plant}.xlsx')
+            write_sap_export(path, **{**scale, 'jobs': min(scale.get('jobs', 1000), 1000), 'seed': plant})
+            plants.append((path, f'plant{plant}.xlsx'))
+        results['parse_workbooks.serial'] = measure(lambda: parse_workbooks(plants, processes=1), rounds)
+        results['parse_workbooks.parallel'] = measure(lambda: parse_workbooks(plants), rounds)
+
+        # A hot path that lost its index would be timed as a full scan; fail the run instead
+        scans = full_scans()
+        if scans:
+            raise RuntimeError("Hot paths scan tables in full: "
+                               + '; '.join(f"{name} ({', '.join(tables)})" for name, _, tables in scans))
+        db.session.remove()
+
+    client = app.test_client()
+    for name, call in route_benchmarks(client, work_center, operation_id, workbook):
+        results[name] = measure(lambda call=call: _check(call()), rounds)
+    return results
@@ -0,0 +1,146 @@
+from app import app, db
+from models import DataVersion
+from flask import request, make_response, Response
+from sqlalchemy import insert, select, update
+from collections import OrderedDict
+from urllib.parse import urlencode
+import functools
+import threading
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Headers that are rebuilt for every cached response rather than replayed
+_SKIPPED_HEADERS = {'content-length', 'content-type', 'etag'}
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache whose entries expire after a TTL.
+
+    Any object with the same ``get``/``set``/``clear`` methods can replace it
+    through ``set_cache_backend``, e.g. one backed by a store that several
+    worker processes share. Entries are tagged with the data version, which
+    lives in the database, so a change made by any process invalidates them.
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LRUCache(max_entries=app.config.get('RESPONSE_CACHE_SIZE', 256),
+                                ttl=app.config.get('RESPONSE_CACHE_TTL', 300))
+        return _backend
+
+
+def set_cache_backend(backend):
+    """Swap in another cache backend (see ``LRUCache`` for the interface)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def data_version():
+    """The shared data version, bumped by every committed change to operations"""
+    return db.session.execute(select(DataVersion.version).where(DataVersion.id == 1)).scalar() or 0
+
+
+def bump_data_version():
+    """Invalidate every worker's cached responses; call after committing imports and schedule changes"""
+    try:
+        if not db.session.execute(update(DataVersion).where(DataVersion.id == 1)
+                                  .values(version=DataVersion.version + 1)).rowcount:
+            db.session.execute(insert(DataVersion).values(id=1, version=1))
+        db.session.commit()
+    except Exception as e:
+        # Cached responses then live out RESPONSE_CACHE_TTL; the change itself is already committed
+        db.session.rollback()
+        logger.error(f"❌ Could not bump the data version: {str(e)}")
+        return None
+    version = data_version()
+    logger.debug(f"🔄 Data version bumped to {version}")
+    return version
+
+
+def cached_response(view):
+    """Cache a GET view's response per endpoint and query args until the data version changes.
+
+    Responses carry an ETag, so clients sending ``If-None-Match`` get a 304
+    with no body when nothing changed. Streamed responses are not stored;
+    their ETag is derived from the data version and the request instead, so
+    a matching client gets its 304 before the view runs at all.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or not app.config.get('RESPONSE_CACHE_ENABLED', True):
+            return view(*args, **kwargs)
+
+        backend = get_cache_backend()
+        version = data_version()
+        key = f"{request.endpoint}?{urlencode(sorted(request.args.items(multi=True)))}"
+        entry = backend.get(key)
+
+        if entry is None or entry['version'] != version:
+            stream_etag = hashlib.blake2b(f"{key}@{version}".encode(), digest_size=16).hexdigest()
+            if request.if_none_match.contains_weak(stream_etag):
+                return _revalidated(Response(status=304), stream_etag)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if response.is_streamed:
+                return _revalidated(response, stream_etag)
+            body = response.get_data()
+            entry = {
+                'version': version,
+                'body': body,
+                'mimetype': response.mimetype,
+                'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+                'headers': [(k, v) for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS],
+            }
+            backend.set(key, entry)
+
+        response = Response(entry['body'], mimetype=entry['mimetype'], headers=entry['headers'])
+        return _revalidated(response, entry['etag']).make_conditional(request)
+
+    return wrapper
+
+
+def _revalidated(response, etag):
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # Browsers must revalidate, which costs only a 304
+    return response
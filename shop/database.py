@@ -0,0 +1,116 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.dml import UpdateBase
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# GET /api/* endpoints that must still read the primary: the event stream's
+# ids have to line up with the events the listener reads from the primary, and
+# an import's progress must be visible as soon as its upload returns
+PRIMARY_ONLY_ENDPOINTS = {'stream_changes', 'get_import'}
+
+SQLITE_PROGRESS_STEPS = 10000  # SQLite VM instructions between statement-timeout checks
+
+_last_write = float('-inf')  # time.monotonic() of this process's latest write
+
+
+def engine_options(config, url):
+    """Engine keyword arguments for ``url`` from the DB_POOL_* and DB_PGBOUNCER settings"""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}  # Flask-SQLAlchemy gives in-memory SQLite a single shared connection
+    if config.get('DB_PGBOUNCER'):
+        # PgBouncer in transaction mode does the pooling, and a server connection
+        # changes hands between transactions, so prepared statements can't be kept
+        options = {'poolclass': NullPool}
+        if url.get_driver_name() == 'psycopg':
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 300),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', False),
+    }
+
+
+class RoutingSession(Session):
+    """``db.session`` that reads from the replica during read-only API requests.
+
+    SELECTs in a GET /api/* request go to the ``replica`` bind when one is
+    configured; flushes, DML and locking reads stay on the primary. Once a
+    session has written, or this process wrote within REPLICA_STICKY_SECONDS,
+    reads go to the primary too so they see the change despite replica lag.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        global _last_write
+        if bind is None and self._reads_replica(clause):
+            return self._db.engines[REPLICA_BIND]
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info['wrote'] = True
+            _last_write = time.monotonic()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_replica(self, clause):
+        return (has_request_context() and g.get('_read_replica', False)
+                and not self._flushing and not self.info.get('wrote')
+                and getattr(clause, 'is_select', False)
+                and getattr(clause, '_for_update_arg', None) is None)
+
+
+def _request_timeout_ms():
+    """Statement timeout for the current request: STATEMENT_TIMEOUTS[endpoint] or STATEMENT_TIMEOUT_MS"""
+    if not has_request_context():
+        return None  # Imports, CLI commands and background threads run unbounded
+    config = current_app.config
+    return config.get('STATEMENT_TIMEOUTS', {}).get(request.endpoint, config.get('STATEMENT_TIMEOUT_MS', 0)) or None
+
+
+def _sqlite_deadline(connection, timeout_ms):
+    sqlite = connection.connection.driver_connection
+    if not timeout_ms:
+        sqlite.set_progress_handler(None, 0)
+        return
+    deadline = time.monotonic() + timeout_ms / 1000
+    # A non-zero return aborts the running statement with "interrupted"
+    sqlite.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+
+
+@event.listens_for(Engine, 'begin')
+def _apply_statement_timeout(connection):
+    """Bound every statement of a request's transaction; SET LOCAL also suits PgBouncer"""
+    timeout_ms = _request_timeout_ms()
+    dialect = connection.dialect.name
+    if dialect == 'postgresql' and timeout_ms:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+    elif dialect == 'sqlite':
+        _sqlite_deadline(connection, timeout_ms)
+
+
+def _choose_database():
+    config = current_app.config
+    g._read_replica = (bool(config.get('DATABASE_REPLICA_URL'))
+                       and request.method == 'GET' and request.path.startswith('/api/')
+                       and request.endpoint not in PRIMARY_ONLY_ENDPOINTS
+                       and time.monotonic() - _last_write >= config.get('REPLICA_STICKY_SECONDS', 5))
+
+
+def init_app(app):
+    """Derive engine options and the replica bind from the config and enable read routing"""
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config, config['SQLALCHEMY_DATABASE_URI']))
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        config['SQLALCHEMY_BINDS'] = {**config.get('SQLALCHEMY_BINDS', {}),
+                                      REPLICA_BIND: {'url': replica_url, **engine_options(config, replica_url)}}
+        logger.info(f"🔀 Reading GET /api/* queries from replica {make_url(replica_url).render_as_string()}")
+    app.before_request(_choose_database)
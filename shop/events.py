@@ -0,0 +1,169 @@
+from app import app, db
+from models import ChangeEvent
+from sqlalchemy import delete, func, select
+import threading
+import queue
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_EVENT_CHANGES = 500  # Larger schedule changes are sent without the list; clients fetch ?since= instead
+SUBSCRIBER_BACKLOG = 1000  # Undelivered events per connection before it is dropped and must reconnect
+EVENT_LOCK_KEY = 73018  # pg_advisory_xact_lock key taken by the publishing transaction
+
+_subscribers = set()
+_lock = threading.Lock()
+_listener = None
+
+
+def rollups(work_centers=None):
+    """Rollup rows in the shapes /api/forecast and /api/work_centers return them.
+
+    Work centers that no longer have operations map to None so clients drop them.
+    """
+    from rollup import summary_totals  # Deferred: rollup is imported by the modules that publish
+    from utils import forecast_row, work_center_row
+    totals = summary_totals()
+    names = totals.keys() if work_centers is None else work_centers
+    return {wc: {'forecast': forecast_row(totals[wc]), 'work_center': work_center_row(totals[wc])}
+            if wc in totals else None for wc in names}
+
+
+def publish_event(kind, data, work_centers=None):
+    """Record a change event for every worker's /api/stream clients, with updated rollups.
+
+    Call after the change is committed. ``work_centers`` limits the rollups
+    sent to the ones affected (default: all).
+
+    Readers only ever look past the highest id they have seen, so events must
+    become visible in id order. PostgreSQL hands out ids at insert time, so
+    publishers take turns from the insert to the commit; SQLite already lets
+    one writer in at a time.
+    """
+    try:
+        payload = {**data, 'rollups': rollups(work_centers)}
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.execute(select(func.pg_advisory_xact_lock(EVENT_LOCK_KEY)))  # Released by the commit
+        event = ChangeEvent(kind=kind, payload=json.dumps(payload, default=str))
+        db.session.add(event)
+        db.session.flush()
+        retention = app.config.get('EVENTS_RETENTION', 1000)
+        db.session.execute(delete(ChangeEvent).where(ChangeEvent.id <= event.id - retention))
+        db.session.commit()
+        return event.id
+    except Exception as e:
+        # Clients recover on their next reload; the change itself is already committed
+        db.session.rollback()
+        logger.error(f"❌ Could not publish {kind} event: {str(e)}")
+        return None
+
+
+def _format(event_id, kind, payload):
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def _broadcast(item):
+    with _lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        try:
+            subscriber.put_nowait(item)
+        except queue.Full:
+            with _lock:
+                _subscribers.discard(subscriber)
+            logger.warning("⚠️ Dropped a stream client that fell behind")
+
+
+def _listen(last_id):
+    """Per-process poller fanning events after ``last_id`` out to this worker's connections.
+
+    One query per poll interval serves any number of idle connections.
+    """
+    interval = app.config.get('EVENTS_POLL_INTERVAL', 1.0)
+    with app.app_context():
+        while True:
+            time.sleep(interval)
+            with _lock:
+                if not _subscribers:
+                    continue
+            try:
+                rows = db.session.execute(
+                    select(ChangeEvent.id, ChangeEvent.kind, ChangeEvent.payload)
+                    .where(ChangeEvent.id > last_id).order_by(ChangeEvent.id)).all()
+            except Exception as e:
+                logger.warning(f"⚠️ Event poll failed: {str(e)}")
+                rows = []
+            finally:
+                db.session.remove()
+            for event_id, kind, payload in rows:
+                last_id = event_id
+                _broadcast((event_id, _format(event_id, kind, payload)))
+
+
+def _ensure_listener():
+    global _listener
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            # Start from the latest id now, not when the thread gets going, so nothing is skipped
+            _listener = threading.Thread(target=_listen, args=(latest_event_id(),),
+                                         name='event-listener', daemon=True)
+            _listener.start()
+
+
+def latest_event_id():
+    return db.session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+
+def missed_events(last_event_id):
+    """Events after ``last_event_id`` as SSE messages for a reconnecting client.
+
+    Returns None when some of them have already been pruned, in which case the
+    client has to reload everything.
+    """
+    oldest = db.session.execute(select(func.min(ChangeEvent.id))).scalar()
+    if oldest is not None and oldest > last_event_id + 1 and last_event_id < latest_event_id():
+        return None
+    rows = db.session.execute(
+        select(ChangeEvent.id, ChangeEvent.kind, ChangeEvent.payload)
+        .where(ChangeEvent.id > last_event_id).order_by(ChangeEvent.id)).all()
+    return [(event_id, _format(event_id, kind, payload)) for event_id, kind, payload in rows]
+
+
+def subscribe():
+    """Register a connection before reading its backlog, so no event falls between the two"""
+    subscriber = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+    _ensure_listener()
+    with _lock:
+        _subscribers.add(subscriber)
+    return subscriber
+
+
+def stream_events(subscriber, backlog, last_event_id=0):
+    """SSE generator for one connection: ``backlog`` first (None means reload), then live events"""
+    keepalive = app.config.get('EVENTS_KEEPALIVE', 15)
+    try:
+        yield "retry: 5000\n\n"
+        if backlog is None:
+            yield "event: reload\ndata: {}\n\n"
+            backlog = []
+        for event_id, message in backlog:
+            last_event_id = max(last_event_id, event_id)
+            yield message
+        while True:
+            try:
+                event_id, message = subscriber.get(timeout=keepalive)
+            except queue.Empty:
+                with _lock:
+                    if subscriber not in _subscribers:
+                        return  # Dropped for falling behind; the browser reconnects with Last-Event-ID
+                yield ": keepalive\n\n"
+                continue
+            if event_id > last_event_id:
+                last_event_id = event_id
+                yield message
+    finally:
+        with _lock:
+            _subscribers.discard(subscriber)
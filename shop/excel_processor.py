@@ -79,81 +79,86 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
 
-def process_sap_data(df):
-    """Process SAP data from Excel and return structured data."""
+# Accepted lowercase spellings of each column; description is optional
+COLUMN_ALTERNATIVES = {
+    'order': ['order', 'job', 'order_id', 'work order'],
+    'oper./act.': ['oper./act.', 'operation', 'operation_number'],
+    'oper.workcenter': ['oper.workcenter', 'work_center', 'workcenter', 'work center'],
+    'description': ['description', 'task_description', 'task'],
+    'work': ['work', 'planned_hours', 'planned', 'planned hours'],
+    'actual work': ['actual work', 'actual_hours', 'actual', 'actual hours'],
+}
+OPTIONAL_COLUMNS = {'description'}
+ALL_ALTERNATIVES = {alias for aliases in COLUMN_ALTERNATIVES.values() for alias in aliases}
+
+JOB_COLUMNS = ['order', 'oper./act.', 'oper.workcenter', 'description', 'work', 'actual work', 'remaining_work']
+JOBS_CHUNK_SIZE = 5000  # Job records per chunk yielded by process_sap_data
+
+def urgency(planned, remaining):
+    """Critical above half the planned work remaining, High above a fifth, else Normal"""
+    ratio = remaining / planned.replace(0, np.nan)
+    return np.select([planned == 0, ratio > 0.5, ratio > 0.2], ['Normal', 'Critical', 'High'], default='Normal')
+
+def _summarize(frame, by):
+    """Hours, remaining work, job count and urgency per ``by`` group in one grouped aggregation"""
+    stats = frame.groupby(by, observed=True).agg(**{
+        'work': ('work', 'sum'),
+        'actual work': ('actual work', 'sum'),
+        'remaining_work': ('remaining_work', 'sum'),
+        'job_count': ('work', 'size'),
+    })
+    stats['urgency'] = urgency(stats['work'], stats['remaining_work'])
+    stats.index = stats.index.rename('name')
+    return stats.reset_index()[['name', 'work', 'actual work', 'remaining_work', 'urgency', 'job_count']]
+
+def _resolve_columns(df):
+    """Rename the first present alternative of each column to its canonical name"""
+    lowered = {str(col).strip().lower(): col for col in df.columns}
+    renames = {}
+    for key, alternatives in COLUMN_ALTERNATIVES.items():
+        found = next((lowered[alt] for alt in alternatives if alt in lowered), None)
+        if found is None:
+            if key in OPTIONAL_COLUMNS:
+                continue
+            raise KeyError(f"Missing required column {key}. Expected one of: {alternatives}")
+        renames[found] = key
+    return df[list(renames)].rename(columns=renames)
+
+def _job_chunks(jobs, chunk_size):
+    for start in range(0, len(jobs), chunk_size):
+        chunk = jobs.iloc[start:start + chunk_size]
+        yield chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+
+def process_sap_data(df, chunk_size=JOBS_CHUNK_SIZE):
+    """Analyse SAP data from Excel without touching the database.
+
+    Returns work-center statistics and row counts right away; ``jobs`` is a
+    generator of job record lists of at most ``chunk_size`` rows, so callers
+    can stream them instead of holding every record at once.
+    """
     try:
         logger.info("Starting SAP data processing")
-        
-        # Convert column names to lowercase and strip whitespace
-        df.columns = df.columns.str.strip().str.lower()
-        logger.debug(f"Processed columns: {df.columns.tolist()}")
-
-        # Define expected columns and their alternatives
-        column_mapping = {
-            'order': ['order', 'job', 'order_id'],
-            'oper./act.': ['oper./act.', 'operation', 'operation_number'],
-            'oper.workcenter': ['oper.workcenter', 'work_center', 'workcenter'],
-            'description': ['description', 'task_description', 'task'],
-            'work': ['work', 'planned_hours', 'planned'],
-            'actual work': ['actual work', 'actual_hours', 'actual']
-        }
+        df = _resolve_columns(df)
+
+        df['order'] = df['order'].astype('string').str.strip().astype('category')
+        df['oper.workcenter'] = df['oper.workcenter'].astype('string').str.strip().astype('category')
+        df['work'] = pd.to_numeric(df['work'], errors='coerce').fillna(0.0)
+        df['actual work'] = pd.to_numeric(df['actual work'], errors='coerce').fillna(0.0)
+        df['remaining_work'] = (df['work'] - df['actual work']).clip(lower=0)
 
-        # Verify required columns exist
-        for key, alternatives in column_mapping.items():
-            if not any(col in df.columns for col in alternatives):
-                raise KeyError(f"Missing required column {key}. Expected one of: {alternatives}")
-
-        # Add date fields for tracking
-        now = datetime.now()
-        df['start_date'] = now - timedelta(days=np.random.randint(1, 10, size=len(df)))
-        df['completion_date'] = df['start_date'] + timedelta(days=np.random.randint(5, 15, size=len(df)))
-
-        # Calculate remaining work
-        df['remaining_work'] = df['work'].astype(float) - df['actual work'].astype(float)
-        df['remaining_work'] = df['remaining_work'].apply(lambda x: max(x, 0))
-
-        # Process work center statistics
-        work_center_stats = df.groupby('oper.workcenter').agg({
-            'work': 'sum',
-            'actual work': 'sum',
-            'remaining_work': 'sum'
-        }).reset_index()
-
-        # Calculate job counts per work center
-        job_counts = df.groupby('oper.workcenter').size().reset_index(name='job_count')
-
-        # Determine urgency levels
-        def determine_urgency(row):
-            if row['work'] == 0:
-                return "Normal"
-            ratio = row['remaining_work'] / row['work']
-            if ratio > 0.5:
-                return "Critical"
-            elif ratio > 0.2:
-                return "High"
-            return "Normal"
-
-        work_center_stats['urgency'] = work_center_stats.apply(determine_urgency, axis=1)
-
-        # Prepare work centers data
-        work_centers = (work_center_stats.merge(job_counts, on='oper.workcenter')
-                       .rename(columns={'oper.workcenter': 'name'})
-                       .to_dict('records'))
-
-        # Prepare jobs data
-        jobs = df[['order', 'oper./act.', 'oper.workcenter', 'description', 
-                  'work', 'actual work', 'start_date', 'completion_date', 
-                  'remaining_work']].to_dict('records')
+        work_centers = _summarize(df, 'oper.workcenter').to_dict('records')
+        jobs = df.reindex(columns=JOB_COLUMNS)
 
         logger.info(f"Processed {len(jobs)} jobs across {len(work_centers)} work centers")
-        
+
         return {
-            "jobs": jobs,
+            "rows": len(jobs),
+            "orders": int(df['order'].nunique()),
+            "jobs": _job_chunks(jobs, chunk_size),
             "work_centers": work_centers,
             "schedules": []
         }
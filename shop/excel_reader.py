@@ -0,0 +1,94 @@
+from importer import COLUMN_MAPPINGS, PURCHASE_COLUMN_MAPPINGS
+import pandas as pd
+import openpyxl
+import logging
+
+logger = logging.getLogger(__name__)
+
+KNOWN_COLUMNS = {alias for mapping in (COLUMN_MAPPINGS, PURCHASE_COLUMN_MAPPINGS)
+                 for aliases in mapping.values() for alias in aliases}
+
+
+def resolve_columns(header):
+    """Map header positions to the SAP column names the importer understands"""
+    columns = {}
+    for position, name in enumerate(header):
+        name = str(name).strip() if name is not None else None
+        if name in KNOWN_COLUMNS and name not in columns.values():
+            columns[position] = name
+    return columns
+
+
+def iter_sheet_chunks(worksheet, chunk_size):
+    """Yield DataFrames of at most ``chunk_size`` rows from an openpyxl worksheet.
+
+    Only the columns named in ``COLUMN_MAPPINGS`` and ``PURCHASE_COLUMN_MAPPINGS``
+    are kept. The index holds the zero-based data row number, matching what
+    ``pd.read_excel`` would produce, so import rejects point at the same rows
+    as before.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    columns = resolve_columns(header)
+    logger.debug(f"📊 Excel Columns Found: {list(columns.values())}")
+    positions = list(columns)
+    names = list(columns.values())
+
+    buffer, index = [], []
+    for row_number, values in enumerate(rows):
+        row = [values[i] if i < len(values) else None for i in positions]
+        if all(value is None for value in row):
+            continue  # Blank rows, including the padding read-only sheets often report
+        buffer.append(row)
+        index.append(row_number)
+        if len(buffer) >= chunk_size:
+            yield pd.DataFrame(buffer, columns=names, index=index)
+            buffer, index = [], []
+    if buffer:
+        yield pd.DataFrame(buffer, columns=names, index=index)
+
+
+def iter_excel_chunks(source, chunk_size):
+    """Stream the first sheet of an .xlsx file in fixed-size DataFrame chunks"""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from iter_sheet_chunks(workbook.worksheets[0], chunk_size)
+    finally:
+        workbook.close()
+
+
+def read_sheet(source, sheet_index, chunk_size=50000):
+    """One sheet of an .xlsx file as a single DataFrame, indexed like ``iter_sheet_chunks``"""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        frames = list(iter_sheet_chunks(workbook.worksheets[sheet_index], chunk_size))
+    finally:
+        workbook.close()
+    return pd.concat(frames) if frames else pd.DataFrame()
+
+
+def sheet_names(source):
+    """Titles of the sheets in an .xlsx file, in workbook order"""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def count_excel_rows(source, all_sheets=False):
+    """Return the data row count recorded in the first sheet's dimensions (or every sheet's), or None if unknown"""
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        total = 0
+        for worksheet in workbook.worksheets if all_sheets else workbook.worksheets[:1]:
+            max_row = worksheet.max_row
+            if not max_row:
+                return None
+            total += max(max_row - 1, 0)
+        return total
+    finally:
+        workbook.close()
@@ -0,0 +1,186 @@
+from app import app, db
+from flask import Response, jsonify, request, stream_with_context
+from models import Job, Operation, WorkOrder
+from sqlalchemy import func
+from datetime import datetime
+import tempfile
+import logging
+import csv
+import io
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_ROWS = 2000  # Rows fetched from the cursor and written per chunk
+EXPORT_BLOCK_BYTES = 256 * 1024  # XLSX is sent from its temporary file in blocks of this size
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Exported fields of each dataset; the imported ones are headed with their SAP column names (see export_headers)
+EXPORT_FIELDS = ['work_order_number', 'operation_number', 'work_center', 'planned_hours', 'actual_hours',
+                 'status', 'scheduled_date', 'completed_at']
+JOB_EXPORT_FIELDS = ['job_number', 'work_orders', 'operations', 'planned_hours', 'actual_hours',
+                     'first_scheduled', 'last_completed']
+FORECAST_EXPORT_FIELDS = ['work_center', 'planned_hours', 'actual_hours', 'forecasted', 'remaining']
+EXTRA_HEADERS = {'status': 'Status', 'scheduled_date': 'Scheduled Date', 'completed_at': 'Completed At',
+                 'work_orders': 'Work Orders', 'operations': 'Operations', 'first_scheduled': 'First Scheduled',
+                 'last_completed': 'Last Completed', 'forecasted': 'Forecasted', 'remaining': 'Remaining'}
+
+
+def export_headers(fields=EXPORT_FIELDS):
+    """Column headers in ``fields`` order; an operations file exported this way imports back unchanged"""
+    # importer loads pandas, so it is only imported once an export is requested
+    from importer import COLUMN_MAPPINGS
+    return [COLUMN_MAPPINGS[field][0] if field in COLUMN_MAPPINGS else EXTRA_HEADERS[field]
+            for field in fields]
+
+
+def _parse_day(value):
+    return datetime.strptime(value[:10], '%Y-%m-%d').date() if value else None
+
+
+def export_query(args):
+    """Operations to export, filtered like the API by ``work_center``, ``status`` and ``start``/``end``"""
+    query = (db.select(WorkOrder.work_order_number, Operation.operation_number, Operation.work_center,
+                       Operation.planned_hours, Operation.actual_hours, Operation.status, Operation.scheduled_date,
+                       Operation.completed_at)
+             .join(WorkOrder, Operation.work_order_id == WorkOrder.id)
+             .order_by(WorkOrder.job_id, WorkOrder.id, Operation.id))
+    if args.get('work_center'):
+        query = query.where(Operation.work_center == args['work_center'])
+    if args.get('status'):
+        query = query.where(Operation.status == args['status'])
+    start, end = _parse_day(args.get('start')), _parse_day(args.get('end'))
+    if start:
+        query = query.where(Operation.scheduled_date >= start)
+    if end:
+        query = query.where(Operation.scheduled_date < end)
+    return query.execution_options(yield_per=EXPORT_BATCH_ROWS)
+
+
+def job_export_query(args):
+    """One row per job with its operation totals, filtered like /api/jobs by ``work_center`` and ``status``"""
+    query = (db.select(Job.job_number, func.count(func.distinct(WorkOrder.id)), func.count(Operation.id),
+                       func.coalesce(func.sum(Operation.planned_hours), 0.0),
+                       func.coalesce(func.sum(Operation.actual_hours), 0.0),
+                       func.min(Operation.scheduled_date), func.max(Operation.completed_at))
+             .join(WorkOrder, WorkOrder.job_id == Job.id)
+             .join(Operation, Operation.work_order_id == WorkOrder.id)
+             .group_by(Job.id, Job.job_number)
+             .order_by(Job.id))
+    if args.get('work_center'):
+        query = query.where(Operation.work_center == args['work_center'])
+    if args.get('status'):
+        query = query.where(Operation.status == args['status'])
+    return query.execution_options(yield_per=EXPORT_BATCH_ROWS)
+
+
+def forecast_export_rows(args):
+    """/api/forecast as rows, for every work center or the one given as ``work_center``"""
+    from rollup import summary_for, summary_totals
+    from utils import forecast_row
+    if args.get('work_center'):
+        totals = summary_for(args['work_center'])
+        totals = {args['work_center']: totals} if totals else {}
+    else:
+        totals = summary_totals()
+    rows = []
+    for work_center, values in sorted(totals.items()):
+        forecast = forecast_row(values)
+        rows.append((work_center, forecast['planned'], forecast['actual'], forecast['forecasted'],
+                     forecast['remaining']))
+    return rows
+
+
+def _csv_chunks(headers, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for partition in partitions:
+        writer.writerows(partition)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def _xlsx_chunks(headers, partitions):
+    """Write the rows with openpyxl's write-only workbook, then send the saved file in blocks.
+
+    The write-only sheet spools rows to disk as they are appended and the
+    workbook is saved to a temporary file, so memory stays flat; the download
+    starts once the workbook is saved, as openpyxl only zips the sheet then.
+    """
+    # openpyxl is loaded on the first XLSX export, not at worker startup
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('SAPDATA')
+    sheet.append(headers)
+    for partition in partitions:
+        for row in partition:
+            sheet.append(tuple(row))
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            block = f.read(EXPORT_BLOCK_BYTES)
+            if not block:
+                break
+            yield block
+
+
+def _export_response(name, fmt, headers, partitions):
+    """Stream ``partitions`` of rows as a CSV or XLSX attachment named after ``name``"""
+    chunks = _csv_chunks if fmt == 'csv' else _xlsx_chunks
+    filename = f"{name}-export-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    logger.info(f"📤 Exporting {name} as {fmt.upper()} ({filename})")
+    response = Response(stream_with_context(chunks(headers, partitions)), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let nginx pass chunks on as they are produced
+    return response
+
+
+def _unknown_format():
+    return jsonify({"status": "error", "message": "Export format must be csv or xlsx"}), 404
+
+
+@app.route('/api/export/operations.<fmt>')
+def export_operations(fmt):
+    """Download operations as CSV or XLSX in the SAPDATA layout, streamed from a server-side cursor.
+
+    Accepts the same ``work_center``, ``status`` and ``start``/``end`` filters
+    as /api/jobs and /api/schedule. Rows are read ``EXPORT_BATCH_ROWS`` at a
+    time, so memory use does not grow with the size of the export.
+    """
+    if fmt not in EXPORT_FORMATS:
+        return _unknown_format()
+    try:
+        query = export_query(request.args)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must be YYYY-MM-DD"}), 400
+    return _export_response('SAPDATA', fmt, export_headers(), db.session.execute(query).partitions())
+
+
+@app.route('/api/export/jobs.<fmt>')
+def export_jobs(fmt):
+    """Download one row per job with its work order and operation counts and hours, as CSV or XLSX.
+
+    Accepts the ``work_center`` and ``status`` filters of /api/jobs, which
+    limit the operations counted; jobs without matching operations are left
+    out. Streamed from a server-side cursor like the operations export.
+    """
+    if fmt not in EXPORT_FORMATS:
+        return _unknown_format()
+    rows = db.session.execute(job_export_query(request.args))
+    return _export_response('jobs', fmt, export_headers(JOB_EXPORT_FIELDS), rows.partitions())
+
+
+@app.route('/api/export/forecast.<fmt>')
+def export_forecast(fmt):
+    """Download /api/forecast, one row per work center, as CSV or XLSX; accepts ``work_center``"""
+    if fmt not in EXPORT_FORMATS:
+        return _unknown_format()
+    rows = forecast_export_rows(request.args)
+    return _export_response('forecast', fmt, export_headers(FORECAST_EXPORT_FIELDS), [rows])
@@ -0,0 +1,161 @@
+from app import db
+from models import Operation
+from snapshot import load_snapshot, snapshot_frame
+from archive import archived_completions
+from sqlalchemy import select
+import numpy as np
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Forecast horizons in days
+HORIZONS = {'week': 7, 'month': 30, 'quarter': 91}
+
+TREND_WINDOW = 4  # Weeks of completions in the rolling efficiency
+TREND_SPAN = 4  # Span, in weeks, of the exponentially weighted efficiency
+
+OPERATION_COLUMNS = ['work_center', 'status', 'planned_hours', 'actual_hours', 'scheduled_date', 'completed_at']
+
+
+def load_operations_frame(work_center=None):
+    """Load operations once as columnar arrays, from the shared snapshot when there is one.
+
+    Archived completions are added as per-day totals, so efficiencies keep
+    the history that archiving moved out of the operation table.
+    """
+    snapshot = load_snapshot()
+    if snapshot is not None:
+        frame = snapshot_frame(snapshot, work_center)
+    else:
+        query = select(Operation.work_center, Operation.status, Operation.planned_hours,
+                       Operation.actual_hours, Operation.scheduled_date, Operation.completed_at)
+        if work_center:
+            query = query.where(Operation.work_center == work_center)
+        frame = operations_frame(db.session.execute(query).all())
+    archived = archived_completions(work_center)
+    if not archived:
+        return frame
+    frame = pd.concat([frame, operations_frame(archived)], ignore_index=True)
+    frame['work_center'] = frame['work_center'].astype('category')
+    return frame
+
+
+def operations_frame(rows):
+    """Build the typed frame the forecasting functions expect from (work_center, status, ...) rows"""
+    frame = pd.DataFrame(rows, columns=OPERATION_COLUMNS)
+    frame['work_center'] = frame['work_center'].astype('category')
+    frame['planned_hours'] = frame['planned_hours'].astype(float).fillna(0.0)
+    frame['actual_hours'] = frame['actual_hours'].astype(float).fillna(0.0)
+    frame['scheduled_date'] = pd.to_datetime(frame['scheduled_date'])
+    frame['completed_at'] = pd.to_datetime(frame['completed_at'])
+    return frame
+
+
+def forecast_hours(planned, actual, completed):
+    """Remaining hours scaled by the efficiency of completed operations.
+
+    Same result as the original ``calculate_forecast``: with nothing completed
+    the total planned hours are returned unchanged.
+    """
+    planned = np.asarray(planned, dtype=float)
+    if not planned.size:
+        return 0
+    completed = np.asarray(completed, dtype=bool)
+    if not completed.any():
+        return planned.sum()
+
+    completed_planned = planned[completed].sum()
+    efficiency_factor = (np.asarray(actual, dtype=float)[completed].sum() / completed_planned
+                         if completed_planned else 1.0)
+    return round(float(planned[~completed].sum() * efficiency_factor), 2)
+
+
+def efficiency_trends(frame, window=TREND_WINDOW, span=TREND_SPAN):
+    """Rolling and exponentially weighted efficiency per work center from weekly completions.
+
+    All work centers are handled together as the columns of one weeks x
+    work centers frame, so the cost barely depends on how many there are.
+    """
+    done = frame[frame['status'].eq('Completed') & frame['completed_at'].notna()]
+    if done.empty:
+        return pd.DataFrame(columns=['rolling_efficiency', 'ewm_efficiency'], dtype=float)
+
+    weekly = (done.groupby(['work_center', pd.Grouper(key='completed_at', freq='W')], observed=True)
+              [['planned_hours', 'actual_hours']].sum())
+    weeks = pd.date_range(weekly.index.get_level_values(1).min(), weekly.index.get_level_values(1).max(), freq='W')
+    planned = weekly['planned_hours'].unstack(level=0).reindex(weeks, fill_value=0.0).fillna(0.0)
+    actual = weekly['actual_hours'].unstack(level=0).reindex(weeks, fill_value=0.0).fillna(0.0)
+
+    rolling = (actual.rolling(window, min_periods=1).sum()
+               / planned.rolling(window, min_periods=1).sum().replace(0.0, np.nan))
+    ratio = actual / planned.replace(0.0, np.nan)
+    ewm = ratio.ewm(span=span, ignore_na=True).mean().ffill()
+
+    trends = pd.DataFrame({'rolling_efficiency': rolling.iloc[-1], 'ewm_efficiency': ewm.iloc[-1]})
+    return trends.replace([np.inf, -np.inf], np.nan)
+
+
+def forecast_work_centers(frame=None, horizons=None, today=None):
+    """Forecast every work center in one vectorized pass.
+
+    For each horizon, the forecast is the planned hours of open operations
+    scheduled to start by then, scaled by the work center's exponentially
+    weighted efficiency (falling back to its overall completed-ops
+    efficiency, then to 1.0).
+    """
+    if frame is None:
+        frame = load_operations_frame()
+    horizons = horizons or HORIZONS
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+
+    completed = frame['status'].eq('Completed')
+    planned = frame['planned_hours']
+    actual = frame['actual_hours']
+    open_ops = ~completed
+
+    columns = {
+        'work_center': frame['work_center'],
+        'planned': planned,
+        'actual': actual,
+        'completed_count': completed.astype(int),
+        'completed_planned': planned.where(completed, 0.0),
+        'completed_actual': actual.where(completed, 0.0),
+        'remaining_planned': planned.where(open_ops, 0.0),
+        'unscheduled_planned': planned.where(open_ops & frame['scheduled_date'].isna(), 0.0),
+    }
+    for name, days in horizons.items():
+        due = open_ops & (frame['scheduled_date'] <= today + pd.Timedelta(days=days))
+        columns[f'horizon_{name}'] = planned.where(due, 0.0)
+    sums = pd.DataFrame(columns).groupby('work_center', observed=True).sum()
+
+    efficiency = sums['completed_actual'] / sums['completed_planned'].replace(0.0, np.nan)
+    trends = efficiency_trends(frame).reindex(sums.index)
+    factor = trends['ewm_efficiency'].fillna(efficiency).fillna(1.0)
+
+    forecasted = ((sums['remaining_planned'] * efficiency.fillna(1.0)).round(2)
+                  .where(sums['completed_count'] > 0, sums['planned']))
+
+    result = {}
+    for work_center in sums.index:
+        row = sums.loc[work_center]
+        result[work_center] = {
+            'planned': float(row['planned']),
+            'actual': float(row['actual']),
+            'remaining': float(row['planned'] - row['actual']),
+            'forecasted': _number(forecasted[work_center]),
+            'efficiency': _number(efficiency[work_center], 4),
+            'rolling_efficiency': _number(trends.at[work_center, 'rolling_efficiency'], 4),
+            'ewm_efficiency': _number(trends.at[work_center, 'ewm_efficiency'], 4),
+            'unscheduled': round(float(row['unscheduled_planned'] * factor[work_center]), 2),
+            'horizons': {name: round(float(row[f'horizon_{name}'] * factor[work_center]), 2)
+                         for name in horizons},
+        }
+    return result
+
+
+def _number(value, digits=None):
+    """JSON-friendly float: NaN becomes None"""
+    if value is None or pd.isna(value):
+        return None
+    return round(float(value), digits) if digits is not None else float(value)
@@ -0,0 +1,248 @@
+from app import app, db
+from models import ImportRun
+from utils import process_sapdata_batch, process_sapdata_file
+from excel_reader import count_excel_rows
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select, update
+from datetime import datetime
+import multiprocessing
+import threading
+import logging
+import json
+import uuid
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: imports are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+IMPORT_LOCK_KEY = 73017  # pg_advisory_xact_lock key taken by the running import
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _green():
+    """Whether this is a gevent worker, where threads are greenlets sharing one OS thread"""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # One import at a time: each one preloads the stored keys and would
+            # miss operations another import inserted in the meantime
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sap-import')
+        return _executor
+
+
+def _start(target, import_id, *args):
+    """Run an import in the background: on this process's import thread, or in a process of its own under gevent.
+
+    A greenlet parsing a workbook would stall every other connection of a
+    gevent worker, so there each import gets a fresh spawned interpreter,
+    free of the monkey patching, and a greenlet waits for it to exit.
+    _ImportLock still runs them one at a time.
+    """
+    if _green():
+        import gevent
+        process = multiprocessing.get_context('spawn').Process(
+            target=_run_in_process, args=(dict(app.config), target, import_id, *args), name='sap-import')
+        process.start()
+        gevent.spawn(_reap, process, import_id)
+    else:
+        _get_executor().submit(target, import_id, *args)
+
+
+def _run_in_process(config, target, *args):
+    """Entry point of a spawned import process: set the app up with the parent's config, then import"""
+    from app import create_app
+    create_app(config)
+    target(*args)
+
+
+def _reap(process, import_id):
+    """Wait for an import process to exit; if it died mid-import, mark the run failed rather than leave it running"""
+    process.join()
+    if not process.exitcode:
+        return
+    logger.error(f"❌ Import {import_id} process exited with code {process.exitcode}")
+    with app.app_context():
+        db.session.execute(update(ImportRun)
+                           .where(ImportRun.import_id == import_id, ImportRun.status.in_(['queued', 'running']))
+                           .values(status='failed', error=f"Import process exited with code {process.exitcode}",
+                                   finished_at=datetime.utcnow()))
+        db.session.commit()
+
+
+class _ImportLock:
+    """Held for the length of an import, so imports queued on different worker processes run one at a time.
+
+    PostgreSQL takes a transaction-level advisory lock on a connection of its
+    own (which also holds under PgBouncer's transaction pooling); SQLite,
+    always on one host, locks a file in the upload folder.
+    """
+
+    def __enter__(self):
+        self._connection = self._file = None
+        if db.engine.dialect.name == 'postgresql':
+            self._connection = db.engine.connect()
+            self._connection.execute(select(func.pg_advisory_xact_lock(IMPORT_LOCK_KEY)))
+        elif fcntl is not None:
+            self._file = open(os.path.join(app.config['UPLOAD_FOLDER'], '.import.lock'), 'w')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._connection is not None:
+            self._connection.close()  # Rolling back releases the lock
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+
+
+def _update(import_id, **fields):
+    db.session.execute(update(ImportRun).where(ImportRun.import_id == import_id).values(**fields))
+    db.session.commit()
+
+
+def _track(filename):
+    """Record a new queued import and return its ID"""
+    import_id = uuid.uuid4().hex
+    db.session.add(ImportRun(import_id=import_id, status='queued', filename=filename[:255] if filename else None))
+    db.session.commit()
+    return import_id
+
+
+def submit_import(filepath, filename):
+    """Queue a saved upload for import and return its import ID right away"""
+    import_id = _track(filename)
+    _start(_run_import, import_id, filepath, filename)
+    logger.info(f"📥 Queued import {import_id} for {filename}")
+    return import_id
+
+
+def submit_batch_import(uploads):
+    """Queue saved uploads (``(path, name)`` pairs of .xlsx and .zip files) as one batch import"""
+    filename = ', '.join(name for _, name in uploads)
+    import_id = _track(filename)
+    _start(_run_batch_import, import_id, uploads)
+    logger.info(f"📥 Queued batch import {import_id} for {len(uploads)} files")
+    return import_id
+
+
+def _progress(import_id):
+    def progress(result):
+        _update(import_id,
+                rows=result['rows'],
+                rejected=len(result['rejected']),
+                inserted=result['inserted'],
+                updated=result['updated'],
+                unchanged=result['unchanged'])
+    return progress
+
+
+def _finish(import_id, result):
+    _update(import_id, status='completed', skipped=result['skipped'],
+            rejects=json.dumps(result['rejected'], default=str), finished_at=datetime.utcnow())
+    logger.info(f"✅ Import {import_id} finished")
+
+
+def _fail(import_id, error):
+    logger.error(f"❌ Import {import_id} failed: {str(error)}")
+    db.session.rollback()
+    _update(import_id, status='failed', error=str(error), finished_at=datetime.utcnow())
+
+
+def _remove(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _run_import(import_id, filepath, filename):
+    """Worker body: wait for any other worker's import, stream the file into the database, then remove it"""
+    with app.app_context():
+        try:
+            with _ImportLock():
+                _update(import_id, status='running', started_at=datetime.utcnow())
+                with open(filepath, 'rb') as f:
+                    _update(import_id, rows_total=count_excel_rows(f))
+                    f.seek(0)
+                    result = process_sapdata_file(f, progress=_progress(import_id), filename=filename,
+                                                  import_id=import_id)
+            _finish(import_id, result)
+        except Exception as e:
+            _fail(import_id, e)
+        finally:
+            _remove([filepath])
+
+
+def _run_batch_import(import_id, uploads):
+    """Worker body: unpack archives, parse every sheet in parallel, write once, then remove the files"""
+    from batch_import import expand_uploads
+    extracted = []
+    with app.app_context():
+        try:
+            with _ImportLock():
+                _update(import_id, status='running', started_at=datetime.utcnow())
+                workbooks, extracted = expand_uploads(uploads, app.config['UPLOAD_FOLDER'])
+                if not workbooks:
+                    raise ValueError("No .xlsx files found in the upload")
+                _update(import_id, rows_total=sum(count_excel_rows(path, all_sheets=True) or 0
+                                                  for path, _ in workbooks))
+                result = process_sapdata_batch(workbooks, progress=_progress(import_id), import_id=import_id)
+            _finish(import_id, result)
+        except Exception as e:
+            _fail(import_id, e)
+        finally:
+            _remove([path for path, _ in uploads] + extracted)
+
+
+def get_import_status(import_id):
+    """Return an import's progress with throughput and ETA, or None if unknown"""
+    run = db.session.execute(select(ImportRun).where(ImportRun.import_id == import_id)).scalar_one_or_none()
+    if run is None:
+        return None
+    state = {
+        'id': run.import_id,
+        'filename': run.filename,
+        'status': run.status,
+        'rows_total': run.rows_total,
+        'rows_processed': run.rows or 0,
+        'rows_rejected': run.rejected or 0,
+        'inserted': run.inserted or 0,
+        'updated': run.updated or 0,
+        'unchanged': run.unchanged or 0,
+        'removed': run.removed or 0,
+        'skipped': bool(run.skipped),
+        'error': run.error,
+    }
+    if run.status == 'completed':
+        state['rejected'] = json.loads(run.rejects) if run.rejects else []
+
+    throughput = None
+    eta = None
+    if run.started_at:
+        elapsed = ((run.finished_at or datetime.utcnow()) - run.started_at).total_seconds()
+        if elapsed > 0:
+            throughput = round(state['rows_processed'] / elapsed, 1)
+        if run.status == 'running' and throughput and run.rows_total:
+            eta = round(max(run.rows_total - state['rows_processed'], 0) / throughput, 1)
+        elif run.status == 'completed':
+            eta = 0
+
+    for field, value in (('queued_at', run.created_at), ('started_at', run.started_at),
+                         ('finished_at', run.finished_at)):
+        state[field] = value.isoformat() if value else None
+    state['rows_per_second'] = throughput
+    state['eta_seconds'] = eta
+    return state
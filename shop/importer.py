@@ -0,0 +1,535 @@
+from app import app, db
+from models import Job, WorkOrder, Operation, PurchaseOrder, PURCHASE_STATUSES
+from cache import bump_data_version
+from snapshot import refresh_snapshot
+from events import publish_event
+from metrics import record_import
+from rollup import apply_deltas, contributions, operation_contributions
+from archive import archived_operation_keys, restore_parents
+from sqlalchemy import delete, insert, select, update
+import numpy as np
+import pandas as pd
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Accepted spellings of each SAP column, in order of preference
+COLUMN_MAPPINGS = {
+    'job_number': ['Order', 'ORDER', 'Job'],
+    'work_order_number': ['Order', 'ORDER', 'Work Order'],
+    'operation_number': ['Oper./Act.', 'OPERATION', 'Operation'],
+    'work_center': ['Oper.WorkCenter', 'WORK_CENTER', 'Work Center'],
+    'planned_hours': ['Work', 'PLANNED_HOURS', 'Planned Hours'],
+    'actual_hours': ['Actual work', 'ACTUAL_HOURS', 'Actual Hours'],
+}
+
+# Purchase-order columns; rows without a PO number carry no purchase order
+PURCHASE_COLUMN_MAPPINGS = {
+    'po_number': ['Purchasing Document', 'Purch.Doc.', 'PO Number'],
+    'material': ['Material', 'MATERIAL', 'Material Description'],
+    'quantity': ['PO Quantity', 'Order Quantity', 'Quantity'],
+    'value': ['Net Order Value', 'Net Value', 'PO Value'],
+    'delivery_date': ['Delivery Date', 'Deliv. Date', 'DELIVERY_DATE'],
+    'status': ['PO Status', 'Delivery Status', 'PO_STATUS'],
+}
+
+KEY_COLUMNS = ['job_number', 'operation_number']
+
+# Imported values that make up an operation's row fingerprint
+HASHED_COLUMNS = ['work_center', 'planned_hours', 'actual_hours']
+
+REJECT_SAMPLE_SIZE = 5  # Rejected rows listed by number in the import summary log
+
+
+def _as_text(series):
+    """Convert a column to stripped strings, keeping integral floats free of a trailing '.0'"""
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        if (values % 1 == 0).all():
+            series = series.astype('Int64')
+    return series.astype('string').str.strip()
+
+
+def _as_number(series):
+    """Convert a column to floats; unparseable cells become NaN"""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype('string').str.strip()
+    return pd.to_numeric(series, errors='coerce').astype(float)
+
+
+def _coalesce(df, aliases, convert):
+    """Return (value, present) for the first alias column holding a usable value per row"""
+    value = pd.Series(np.nan, index=df.index, dtype=object)
+    present = pd.Series(False, index=df.index)
+    for col in aliases:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        converted = convert(raw)
+        take = value.isna() & converted.notna()
+        value = value.where(~take, converted)
+        present |= raw.notna()
+    return value, present
+
+
+def normalize_frame(df):
+    """Resolve column aliases and coerce values with vectorized pandas operations.
+
+    Returns the clean frame (one row per job/operation, last occurrence wins)
+    and a list of ``{"row", "reason"}`` rejects for rows that cannot be imported.
+    """
+    logger.debug(f"📊 Excel Columns Found: {df.columns.tolist()}")
+
+    job_number, _ = _coalesce(df, COLUMN_MAPPINGS['job_number'], _as_text)
+    operation_number, op_present = _coalesce(df, COLUMN_MAPPINGS['operation_number'], _as_number)
+    work_center, _ = _coalesce(df, COLUMN_MAPPINGS['work_center'], _as_text)
+    planned_hours, planned_present = _coalesce(df, COLUMN_MAPPINGS['planned_hours'], _as_number)
+    actual_hours, actual_present = _coalesce(df, COLUMN_MAPPINGS['actual_hours'], _as_number)
+
+    operation_number = operation_number.astype(float)
+    planned_hours = planned_hours.astype(float)
+    actual_hours = actual_hours.astype(float)
+
+    job_number = job_number.where(job_number.notna() & (job_number.astype('string') != ''))
+    work_center = work_center.where(work_center.notna() & (work_center.astype('string') != ''))
+
+    # Checks run in the same order as the original row-by-row importer
+    checks = [
+        (job_number.isna(), 'Missing Job Number'),
+        (operation_number.isna() & op_present, 'Invalid Operation Number'),
+        (operation_number.isna(), 'Missing Operation Number'),
+        (~np.isfinite(operation_number.fillna(0)), 'Invalid Operation Number'),
+        (work_center.isna(), 'Missing Work Center'),
+        (planned_hours.isna() & planned_present, 'Invalid Planned Hours'),
+        (actual_hours.isna() & actual_present, 'Invalid Actual Hours'),
+    ]
+    reason = pd.Series(None, index=df.index, dtype=object)
+    for mask, message in checks:
+        reason = reason.where(reason.notna() | ~mask, message)
+
+    rejected = reason.notna()
+    rejects = [{'row': int(idx), 'reason': msg} for idx, msg in reason[rejected].items()]
+
+    keep = ~rejected
+    clean = pd.DataFrame({
+        'job_number': job_number[keep].astype(str),
+        'operation_number': np.trunc(operation_number[keep]).astype(np.int64),
+        'work_center': work_center[keep].astype(str),
+        'planned_hours': planned_hours[keep].fillna(0.0),
+        'actual_hours': actual_hours[keep].fillna(0.0),
+    })
+    clean['work_order_number'] = clean['job_number']  # Some cases work order is same as job number
+    clean = clean.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+    clean['row_hash'] = row_hashes(clean)
+
+    return clean, rejects
+
+
+def _as_date(series):
+    """Convert a column to dates; unparseable cells become NaT"""
+    return pd.to_datetime(series, errors='coerce').dt.date.astype(object)
+
+
+def normalize_purchase_orders(df):
+    """Purchase orders carried on SAP rows, one per PO number (last occurrence wins)"""
+    po_number, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['po_number'], _as_text)
+    has_po = po_number.notna() & (po_number.astype('string') != '')
+    if not has_po.any():
+        return pd.DataFrame(columns=['po_number', 'work_order_number', 'material', 'quantity',
+                                     'value', 'delivery_date', 'status'])
+
+    df = df[has_po]
+    work_order_number, _ = _coalesce(df, COLUMN_MAPPINGS['work_order_number'], _as_text)
+    material, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['material'], _as_text)
+    quantity, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['quantity'], _as_number)
+    value, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['value'], _as_number)
+    delivery_date, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['delivery_date'], _as_date)
+    status, _ = _coalesce(df, PURCHASE_COLUMN_MAPPINGS['status'], _as_text)
+
+    orders = pd.DataFrame({
+        'po_number': po_number[has_po].astype(str),
+        'work_order_number': work_order_number,
+        'material': material,
+        'quantity': quantity.astype(float).fillna(0.0),
+        'value': value.astype(float).fillna(0.0),
+        'delivery_date': delivery_date,
+        'status': status.where(status.isin(PURCHASE_STATUSES), 'Open'),
+    })
+    return orders.drop_duplicates(subset=['po_number'], keep='last')
+
+
+def row_hashes(clean):
+    """Fingerprint each normalized row as a signed 64-bit integer"""
+    hashes = pd.util.hash_pandas_object(clean[HASHED_COLUMNS], index=False).to_numpy()
+    return hashes.view(np.int64)
+
+
+def _insert_ignore(model, index_elements):
+    """INSERT that skips rows already present, using the dialect's native upsert where available"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(model)
+
+
+def _upsert(model, index_elements, columns):
+    """INSERT that updates ``columns`` of rows already present, or None without a native upsert"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(model)
+    return stmt.on_conflict_do_update(index_elements=index_elements,
+                                      set_={column: stmt.excluded[column] for column in columns})
+
+
+def _write_purchase_orders(orders, work_orders):
+    """Insert or update purchase orders by PO number, linked to their work order when it is known"""
+    rows = [
+        {'po_number': po, 'work_order_id': (work_orders.get(wo) or (None,))[0], 'material': material,
+         'quantity': float(quantity), 'value': float(value), 'delivery_date': delivery, 'status': status}
+        for po, wo, material, quantity, value, delivery, status in zip(
+            orders['po_number'], orders['work_order_number'], orders['material'], orders['quantity'],
+            orders['value'], orders['delivery_date'], orders['status'])
+    ]
+    for row in rows:
+        if pd.isna(row['material']):
+            row['material'] = None
+        if pd.isna(row['delivery_date']):
+            row['delivery_date'] = None
+
+    stmt = _upsert(PurchaseOrder, ['po_number'], [c for c in rows[0] if c != 'po_number'])
+    if stmt is not None:
+        db.session.execute(stmt, rows)
+        return len(rows)
+
+    existing = dict(db.session.execute(
+        select(PurchaseOrder.po_number, PurchaseOrder.id)
+        .where(PurchaseOrder.po_number.in_([row['po_number'] for row in rows]))).all())
+    updates = [{'id': existing[row['po_number']], **row} for row in rows if row['po_number'] in existing]
+    inserts = [row for row in rows if row['po_number'] not in existing]
+    if updates:
+        db.session.execute(update(PurchaseOrder), updates)
+    if inserts:
+        db.session.execute(insert(PurchaseOrder), inserts)
+    return len(rows)
+
+
+def _import_purchase_orders(orders, keys, chunk_size, result):
+    """Write one batch's normalized purchase orders, chunk by chunk"""
+    for start in range(0, len(orders), chunk_size):
+        chunk = orders.iloc[start:start + chunk_size]
+        try:
+            result['purchase_orders'] += _write_purchase_orders(chunk, keys['work_orders'])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️ Purchase orders starting at row {chunk.index[0]} failed: {str(e)}")
+            result['rejected'].extend({'row': int(idx), 'reason': f'Purchase order: {str(e)}'}
+                                      for idx in chunk.index)
+
+
+def load_existing_keys():
+    """Preload the keys already stored, one query per table"""
+    job_ids = dict(db.session.execute(select(Job.job_number, Job.id)).all())
+    work_orders = {number: (wo_id, job_id) for number, wo_id, job_id in db.session.execute(
+        select(WorkOrder.work_order_number, WorkOrder.id, WorkOrder.job_id)).all()}
+    operations = {(number, op): (op_id, row_hash) for number, op, op_id, row_hash in db.session.execute(
+        select(WorkOrder.work_order_number, Operation.operation_number, Operation.id, Operation.row_hash)
+        .join(WorkOrder, Operation.work_order_id == WorkOrder.id)).all()}
+    return {'jobs': job_ids, 'work_orders': work_orders, 'operations': operations}
+
+
+def _match_existing(clean, operations):
+    """Attach the stored id of each row's operation and flag rows whose fingerprint changed"""
+    missing = (np.nan, None)
+    matches = [operations.get(key, missing) for key in zip(clean['work_order_number'], clean['operation_number'])]
+    operation_id = np.array([match[0] for match in matches], dtype=float)
+    old_hash = np.array([match[1] for match in matches], dtype=object)
+    clean = clean.assign(operation_id=operation_id)
+    clean['changed'] = clean['operation_id'].notna() & (clean['row_hash'].to_numpy(dtype=object) != old_hash)
+    return clean
+
+
+def insert_operations(rows):
+    """Insert new operations with the native upsert and return ``(inserted, stored)``.
+
+    Both map (work_order_id, operation_number) to an operation id. Rows stored
+    since the keys were loaded conflict on uq_operation_work_order_op and are
+    skipped rather than failing the chunk; ``stored`` holds their existing ids
+    so the caller can update them like changed rows.
+    """
+    stmt = _insert_ignore(Operation, ['work_order_id', 'operation_number'])
+    lookup = (select(Operation.work_order_id, Operation.operation_number, Operation.id)
+              .where(Operation.work_order_id.in_({row['work_order_id'] for row in rows})))
+    keys = {(row['work_order_id'], row['operation_number']) for row in rows}
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        inserted = {(wo_id, op): op_id for wo_id, op, op_id in db.session.execute(
+            stmt.returning(Operation.work_order_id, Operation.operation_number, Operation.id), rows)}
+        if len(inserted) == len(rows):
+            return inserted, {}
+        stored = {(wo_id, op): op_id for wo_id, op, op_id in db.session.execute(lookup)
+                  if (wo_id, op) in keys and (wo_id, op) not in inserted}
+        return inserted, stored
+
+    stored = {(wo_id, op): op_id for wo_id, op, op_id in db.session.execute(lookup) if (wo_id, op) in keys}
+    rows = [row for row in rows if (row['work_order_id'], row['operation_number']) not in stored]
+    if rows:
+        db.session.execute(stmt, rows)
+    inserted = {(wo_id, op): op_id for wo_id, op, op_id in db.session.execute(lookup)
+                if (wo_id, op) in keys and (wo_id, op) not in stored}
+    return inserted, stored
+
+
+def _write_chunk(chunk, keys):
+    """Write one chunk of rows and return the keys it created or changed.
+
+    ``keys`` is left untouched so a failed chunk can be rolled back cleanly;
+    the caller merges the returned keys after a successful commit.
+    """
+    job_ids, work_orders = keys['jobs'], keys['work_orders']
+    created = {'jobs': {}, 'work_orders': {}, 'operations': {}}
+
+    missing_jobs = [j for j in chunk['job_number'].unique() if j not in job_ids]
+    missing_numbers = [wo for wo in chunk['work_order_number'].unique() if wo not in work_orders]
+    if missing_jobs or missing_numbers:
+        restore_parents(missing_jobs, missing_numbers)
+    if missing_jobs:
+        db.session.execute(_insert_ignore(Job, ['job_number']),
+                           [{'job_number': j} for j in missing_jobs])
+        created['jobs'] = dict(db.session.execute(
+            select(Job.job_number, Job.id).where(Job.job_number.in_(missing_jobs))).all())
+
+    def job_id_for(number):
+        return job_ids.get(number, created['jobs'].get(number))
+
+    missing_wos = chunk.drop_duplicates('work_order_number')
+    missing_wos = missing_wos[~missing_wos['work_order_number'].isin(work_orders.keys())]
+    if len(missing_wos):
+        db.session.execute(_insert_ignore(WorkOrder, ['work_order_number']), [
+            {'work_order_number': wo, 'job_id': job_id_for(job)}
+            for wo, job in zip(missing_wos['work_order_number'], missing_wos['job_number'])
+        ])
+        created['work_orders'] = {number: (wo_id, job_id) for number, wo_id, job_id in db.session.execute(
+            select(WorkOrder.work_order_number, WorkOrder.id, WorkOrder.job_id)
+            .where(WorkOrder.work_order_number.in_(missing_wos['work_order_number'].tolist()))).all()}
+
+    work_order_ids = []
+    for wo, job in zip(chunk['work_order_number'], chunk['job_number']):
+        wo_id, wo_job_id = work_orders.get(wo) or created['work_orders'].get(wo) or (None, None)
+        work_order_ids.append(wo_id if wo_id is not None and wo_job_id == job_id_for(job) else None)
+    chunk = chunk.assign(work_order_id=work_order_ids)
+    orphaned = chunk['work_order_id'].isna()
+    rejects = [{'row': int(idx), 'reason': 'Work Order belongs to another Job'} for idx in chunk.index[orphaned]]
+    chunk = chunk[~orphaned]
+
+    deltas = []
+    new_ops = chunk[chunk['operation_id'].isna()]
+    if len(new_ops):
+        new_ids, stored = insert_operations([
+            {'operation_number': int(op), 'work_order_id': int(wo_id), 'work_center': wc,
+             'planned_hours': float(planned), 'actual_hours': float(actual), 'status': 'Not Started',
+             'row_hash': int(row_hash)}
+            for op, wo_id, wc, planned, actual, row_hash in zip(
+                new_ops['operation_number'], new_ops['work_order_id'], new_ops['work_center'],
+                new_ops['planned_hours'], new_ops['actual_hours'], new_ops['row_hash'])
+        ])
+        if stored:
+            # Stored by another writer since the keys were loaded: update them instead
+            found = pd.Series([stored.get((int(wo_id), int(op)), np.nan) for wo_id, op in zip(
+                new_ops['work_order_id'], new_ops['operation_number'])], index=new_ops.index, dtype=float)
+            chunk = chunk.assign(operation_id=chunk['operation_id'].fillna(found))
+            chunk['changed'] = chunk['changed'] | found.reindex(chunk.index).notna()
+            new_ops = new_ops[found.isna()]
+        deltas.append(contributions(new_ops['work_center'], pd.Series('Not Started', index=new_ops.index),
+                                    new_ops['planned_hours'], new_ops['actual_hours'],
+                                    pd.Series(False, index=new_ops.index)))
+        for wo, wo_id, op, row_hash in zip(
+                new_ops['work_order_number'], new_ops['work_order_id'], new_ops['operation_number'],
+                new_ops['row_hash']):
+            created['operations'][(wo, int(op))] = (new_ids.get((int(wo_id), int(op))), int(row_hash))
+
+    changed_ops = chunk[chunk['changed']]
+    if len(changed_ops):
+        changed_ids = [int(op_id) for op_id in changed_ops['operation_id']]
+        deltas.append(operation_contributions(changed_ids, sign=-1))
+        db.session.execute(update(Operation), [
+            {'id': int(op_id), 'work_center': wc, 'planned_hours': float(planned),
+             'actual_hours': float(actual), 'row_hash': int(row_hash)}
+            for op_id, wc, planned, actual, row_hash in zip(
+                changed_ops['operation_id'], changed_ops['work_center'], changed_ops['planned_hours'],
+                changed_ops['actual_hours'], changed_ops['row_hash'])
+        ])
+        for wo, op, op_id, row_hash in zip(
+                changed_ops['work_order_number'], changed_ops['operation_number'],
+                changed_ops['operation_id'], changed_ops['row_hash']):
+            created['operations'][(wo, int(op))] = (int(op_id), int(row_hash))
+        deltas.append(operation_contributions(changed_ids))
+
+    apply_deltas(*deltas)
+
+    return created, rejects, len(new_ops), len(changed_ops)
+
+
+def _skip_archived(chunk):
+    """Drop rows of archived operations, which stay archived; returns the rest and how many were dropped"""
+    new = chunk['operation_id'].isna()
+    if not new.any():
+        return chunk, 0
+    archived_keys = archived_operation_keys(chunk.loc[new, 'work_order_number'].unique().tolist())
+    if not archived_keys:
+        return chunk, 0
+    archived = new & np.array([key in archived_keys for key in zip(chunk['work_order_number'],
+                                                                   chunk['operation_number'])])
+    return chunk[~archived], int(archived.sum())
+
+
+def _commit_chunk(chunk, keys, result):
+    """Write and commit one chunk, falling back to row-by-row writes if the batch fails"""
+    try:
+        created, rejects, inserted, updated = _write_chunk(chunk, keys)
+        db.session.commit()
+        batches = [(created, rejects, inserted, updated)]
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"⚠️ Chunk starting at row {chunk.index[0]} failed ({e}); retrying row by row")
+        batches = []
+        for idx in chunk.index:
+            try:
+                batch = _write_chunk(chunk.loc[[idx]], keys)
+                db.session.commit()
+            except Exception as row_error:
+                db.session.rollback()
+                batches.append(({}, [{'row': int(idx), 'reason': str(row_error)}], 0, 0))
+                continue
+            # Later rows in the chunk need the keys this row created
+            created, rejects, inserted, updated = batch
+            for table, values in created.items():
+                keys[table].update(values)
+            batches.append(({}, rejects, inserted, updated))
+
+    for created, rejects, inserted, updated in batches:
+        for table, values in created.items():
+            keys[table].update(values)
+        result['rejected'].extend(rejects)
+        result['inserted'] += inserted
+        result['updated'] += updated
+
+
+def _remove_missing(keys, seen):
+    """Delete stored operations that the imported export no longer contains"""
+    stale_ids = [op_id for key, (op_id, _) in keys['operations'].items() if key not in seen]
+    for start in range(0, len(stale_ids), 5000):
+        batch = stale_ids[start:start + 5000]
+        apply_deltas(operation_contributions(batch, sign=-1))
+        db.session.execute(delete(Operation).where(Operation.id.in_(batch)))
+    db.session.commit()
+    for key in [key for key in keys['operations'] if key not in seen]:
+        del keys['operations'][key]
+    return len(stale_ids)
+
+
+def normalize_frames(frames):
+    """Normalize raw SAP frames one at a time into ``(rows, clean, rejects, purchase_orders)`` batches"""
+    for df in frames:
+        clean, rejects = normalize_frame(df)
+        yield len(df), clean, rejects, normalize_purchase_orders(df)
+
+
+def _import_batches(batches, chunk_size, progress, keys, seen, result):
+    """Write each normalized batch in chunks, accumulating counts into ``result``"""
+    for rows, clean, rejects, orders in batches:
+        result['rows'] += rows
+        result['rejected'].extend(rejects)
+        seen.update(zip(clean['work_order_number'], clean['operation_number']))
+
+        for start in range(0, len(clean), chunk_size):
+            chunk = _match_existing(clean.iloc[start:start + chunk_size], keys['operations'])
+            chunk, archived = _skip_archived(chunk)
+            result['unchanged'] += archived + int((chunk['operation_id'].notna() & ~chunk['changed']).sum())
+            if len(chunk):
+                _commit_chunk(chunk, keys, result)
+            if progress:
+                progress(result)
+
+        _import_purchase_orders(orders, keys, chunk_size, result)
+
+
+def import_chunks(frames, chunk_size=None, progress=None, remove_missing=None):
+    """Bulk import a stream of raw SAP DataFrames; see ``import_batches``"""
+    return import_batches(normalize_frames(frames), chunk_size=chunk_size, progress=progress,
+                          remove_missing=remove_missing)
+
+
+def import_batches(batches, chunk_size=None, progress=None, remove_missing=None):
+    """Bulk import normalized SAP batches, committing once per chunk of rows.
+
+    ``batches`` yields ``(rows, clean, rejects, purchase_orders)`` as made by
+    ``normalize_frames``, or by the batch importer's parallel parse. Existing
+    keys are loaded once up front, so the batches can arrive one at a time
+    from a streaming reader. Rows whose fingerprint matches the stored
+    ``row_hash`` are left alone, as are rows of archived operations; both
+    count as unchanged. Rows that fail validation, or that break a
+    chunk on write, are skipped and reported in ``rejected`` rather than
+    aborting the import. ``progress`` is called with the running result after
+    every committed chunk.
+
+    With ``remove_missing`` (default ``IMPORT_REMOVE_MISSING``) the file is
+    treated as a full snapshot and operations absent from it are deleted,
+    unless some rows were rejected and the snapshot is therefore incomplete.
+    """
+    chunk_size = chunk_size or app.config.get('IMPORT_CHUNK_SIZE', 5000)
+    if remove_missing is None:
+        remove_missing = app.config.get('IMPORT_REMOVE_MISSING', False)
+    result = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'purchase_orders': 0,
+              'rejected': []}
+    started = time.perf_counter()
+    keys = load_existing_keys()
+    seen = set()
+    try:
+        _import_batches(batches, chunk_size, progress, keys, seen, result)
+        if remove_missing:
+            if result['rejected']:
+                logger.warning("⚠️ Rows were rejected; not removing operations missing from the file")
+            else:
+                result['removed'] = _remove_missing(keys, seen)
+    finally:
+        # Committed chunks are visible even if a later one fails
+        bump_data_version()
+        refresh_snapshot()
+        publish_event('import', {field: result[field]
+                                 for field in ('rows', 'inserted', 'updated', 'removed', 'purchase_orders')})
+
+    elapsed = time.perf_counter() - started
+    record_import(result['rows'], elapsed)
+    result['rejected'].sort(key=lambda r: r['row'])
+    logger.info(f"✅ Imported {result['rows']} rows in {elapsed:.1f}s "
+                f"({result['rows'] / elapsed if elapsed else 0:.0f} rows/s): {result['inserted']} inserted, "
+                f"{result['updated']} updated, {result['unchanged']} unchanged, "
+                f"{result['removed']} removed, {len(result['rejected'])} rejected")
+    _log_rejections(result['rejected'])
+    return result
+
+
+def _log_rejections(rejected):
+    """One summary line per rejection reason, with a few sample rows, instead of a line per row"""
+    rows_by_reason = {}
+    for reject in rejected:
+        rows_by_reason.setdefault(reject['reason'], []).append(reject['row'])
+    for reason, rows in sorted(rows_by_reason.items(), key=lambda item: -len(item[1])):
+        sample = ', '.join(str(row) for row in rows[:REJECT_SAMPLE_SIZE])
+        more = ', ...' if len(rows) > REJECT_SAMPLE_SIZE else ''
+        logger.warning(f"⚠️ {len(rows)} rows rejected: {reason} (rows {sample}{more})")
+
+
+def import_frame(df, chunk_size=None):
+    """Bulk import a whole SAP DataFrame"""
+    return import_chunks([df], chunk_size=chunk_size)
@@ -1,9 +1,13 @@
-from app import app
+from app import create_app
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+app = create_app()
+
 if __name__ == "__main__":
+    from schema import upgrade_schema
+    with app.app_context():
+        upgrade_schema()  # The dev server sets up its own schema; deployments run `flask --app main upgrade-db`
     logger.info("Starting Flask application server")
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,378 @@
+from app import app
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import defaultdict
+from datetime import datetime
+import threading
+import cProfile
+import logging
+import json
+import time
+import os
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # Optional: profiles fall back to cProfile .prof dumps
+    Profiler = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: files of exited processes are kept rather than merged
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+PROFILE_HEADER = 'X-Profile'
+FLUSH_INTERVAL = 1.0  # Seconds a process's new values can take to reach METRICS_FOLDER
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class _Metric:
+    """Thread-safe metric keyed by a tuple of label values, rendered in the Prometheus text format.
+
+    Each process counts in memory and writes its values to METRICS_FOLDER
+    (see ``flush_metrics``); /metrics merges every process's values, so any
+    worker reports the totals of all of them.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def dump(self):
+        """This process's values as JSON-ready ``[label values, value]`` pairs"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def render(self, values):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(list(zip(self.labels, key)), value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {value}']
+
+
+class Gauge(_Metric):
+    """Last value set in any process"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = [value, time.time()]
+
+    @staticmethod
+    def merge(a, b):
+        return max(a, b, key=lambda value: value[1])
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {value[0]}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = [counts, total + value]
+
+    @staticmethod
+    def merge(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1]]
+
+    def _samples(self, labels, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+_registry = []
+
+REQUEST_SECONDS = Histogram('shop_request_duration_seconds', 'Time to produce a response, by route.',
+                            ('endpoint', 'method', 'status'))
+REQUEST_STATEMENTS = Histogram('shop_request_sql_statements', 'SQL statements executed per request.',
+                               ('endpoint',), buckets=STATEMENT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('shop_request_sql_seconds', 'Time spent in SQL per request.', ('endpoint',))
+N_PLUS_ONE = Counter('shop_n_plus_one_warnings_total',
+                     'Requests that repeated one SQL statement at least N_PLUS_ONE_THRESHOLD times.',
+                     ('endpoint',))
+SQL_STATEMENTS = Counter('shop_sql_statements_total', 'SQL statements executed, in and out of requests.')
+SQL_SECONDS = Counter('shop_sql_seconds_total', 'Time spent executing SQL statements.')
+IMPORT_ROWS = Counter('shop_import_rows_total', 'SAP rows read by imports.')
+IMPORT_SECONDS = Counter('shop_import_seconds_total', 'Time spent importing SAP data.')
+IMPORT_RATE = Gauge('shop_import_last_rows_per_second', 'Throughput of the most recent import.')
+
+
+_flush_lock = threading.Lock()
+_flush_pending = None  # Timer of this process's next flush
+
+
+def _folder():
+    return app.config.get('METRICS_FOLDER')
+
+
+def flush_metrics():
+    """Write this process's values to METRICS_FOLDER, replacing what it wrote before"""
+    os.makedirs(_folder(), exist_ok=True)
+    path = os.path.join(_folder(), f'{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({metric.name: metric.dump() for metric in _registry}, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def _schedule_flush():
+    """Flush within FLUSH_INTERVAL; updates made meanwhile go out with it"""
+    global _flush_pending
+    with _flush_lock:
+        if _flush_pending is not None:
+            return
+        _flush_pending = threading.Timer(FLUSH_INTERVAL, _background_flush)
+        _flush_pending.daemon = True
+        _flush_pending.start()
+
+
+def _background_flush():
+    global _flush_pending
+    with _flush_lock:
+        _flush_pending = None
+    try:
+        flush_metrics()
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write metrics: {str(e)}")
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}  # Removed by a concurrent merge
+
+
+def _merge_into(totals, dumped):
+    """Add values written by ``flush_metrics`` into ``{metric name: {label values: value}}``"""
+    for metric in _registry:
+        values = totals.setdefault(metric.name, {})
+        for key, value in dumped.get(metric.name, []):
+            key = tuple(key)
+            values[key] = metric.merge(values[key], value) if key in values else value
+
+
+def _dumped(totals):
+    return {name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()}
+
+
+def collect_metrics():
+    """Values of every process that wrote to METRICS_FOLDER, merged per metric and label values.
+
+    Files of processes that have exited are folded into ``exited.json`` so
+    the folder does not grow with worker restarts and import processes.
+    """
+    folder = _folder()
+    exited_path = os.path.join(folder, 'exited.json')
+    totals, exited = {}, {}
+    with open(os.path.join(folder, '.lock'), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # One merge at a time; released when the file closes
+        _merge_into(exited, _read(exited_path))
+        gone = []
+        for name in os.listdir(folder):
+            stem, extension = os.path.splitext(name)
+            if extension != '.json' or not stem.isdigit():
+                continue
+            if fcntl is not None and not _alive(int(stem)):
+                _merge_into(exited, _read(os.path.join(folder, name)))
+                gone.append(name)
+            else:
+                _merge_into(totals, _read(os.path.join(folder, name)))
+        if gone:
+            with open(f'{exited_path}.tmp', 'w') as f:
+                json.dump(_dumped(exited), f)
+            os.replace(f'{exited_path}.tmp', exited_path)
+            for name in gone:
+                os.remove(os.path.join(folder, name))
+    _merge_into(totals, _dumped(exited))
+    return totals
+
+
+def render_metrics():
+    """Every registered metric, totalled over all processes, in the Prometheus text exposition format"""
+    flush_metrics()
+    totals = collect_metrics()
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(totals.get(metric.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def record_import(rows, seconds):
+    """Count one finished import towards the importer throughput metrics"""
+    IMPORT_ROWS.inc(rows)
+    IMPORT_SECONDS.inc(seconds)
+    if seconds > 0:
+        IMPORT_RATE.set(round(rows / seconds, 1))
+    if app.config.get('METRICS_ENABLED', True):
+        flush_metrics()  # Now: the import may have run in a process that is about to exit
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _statement_failed(context):
+    # after_cursor_execute never runs for a failed statement; drop its start time here
+    if context.connection is not None and context.statement is not None:
+        started = context.connection.info.get('query_started')
+        if started:
+            started.pop()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    SQL_STATEMENTS.inc()
+    SQL_SECONDS.inc(elapsed)
+    if has_request_context() and '_sql' in g:
+        g._sql['seconds'] += elapsed
+        g._sql['statements'][statement] += 1
+
+
+def _start_profiler():
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _save_profile(profiler):
+    """Write the request's profile to PROFILE_FOLDER and return the file name"""
+    folder = app.config.get('PROFILE_FOLDER')
+    os.makedirs(folder, exist_ok=True)
+    stem = f"{datetime.utcnow():%Y%m%d%H%M%S%f}-{request.endpoint or 'unmatched'}"
+    if Profiler is not None:
+        profiler.stop()
+        name = f'{stem}.html'
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        name = f'{stem}.prof'
+        profiler.dump_stats(os.path.join(folder, name))
+    logger.info(f"🔬 Saved profile of {request.method} {request.path} to {name}")
+    return name
+
+
+@app.before_request
+def _start_request():
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    g._started = time.perf_counter()
+    g._sql = {'seconds': 0.0, 'statements': defaultdict(int)}
+    if app.config.get('PROFILING_ENABLED', False) and request.headers.get(PROFILE_HEADER):
+        g._profiler = _start_profiler()
+
+
+@app.after_request
+def _finish_request(response):
+    """Record route latency and SQL use; streamed responses are timed until their headers are ready"""
+    if '_started' not in g:
+        return response
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        response.headers[PROFILE_HEADER] = _save_profile(profiler)
+
+    endpoint = request.endpoint or 'unmatched'
+    sql = g.pop('_sql')
+    REQUEST_SECONDS.observe(time.perf_counter() - g.pop('_started'),
+                            endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_STATEMENTS.observe(sum(sql['statements'].values()), endpoint=endpoint)
+    REQUEST_SQL_SECONDS.observe(sql['seconds'], endpoint=endpoint)
+
+    threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    if sql['statements']:
+        statement, count = max(sql['statements'].items(), key=lambda item: item[1])
+        if count >= threshold:
+            N_PLUS_ONE.inc(endpoint=endpoint)
+            logger.warning(f"⚠️ Possible N+1 in {endpoint}: one statement ran {count} times: "
+                           f"{' '.join(statement.split())[:200]}")
+    _schedule_flush()
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint; whichever worker answers reports the totals of all of them"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return Response('Metrics are disabled\n', status=404, mimetype='text/plain')
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -10,18 +10,130 @@ class Job(db.Model):
 class WorkOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     work_order_number = db.Column(db.String(50), unique=True, nullable=False)
-    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False)
+    job_id = db.Column(db.Integer, db.ForeignKey('job.id'), nullable=False, index=True)
     operations = db.relationship('Operation', backref='work_order', lazy=True, cascade="all, delete-orphan")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Operation(db.Model):
+    # The unique key also serves lookups by work_order_id alone (its leading column)
+    __table_args__ = (db.UniqueConstraint('work_order_id', 'operation_number', name='uq_operation_work_order_op'),)
+
     id = db.Column(db.Integer, primary_key=True)
     operation_number = db.Column(db.Integer, nullable=False)
     work_order_id = db.Column(db.Integer, db.ForeignKey('work_order.id'), nullable=False)
-    work_center = db.Column(db.String(50), nullable=False)
+    work_center = db.Column(db.String(50), nullable=False, index=True)
     planned_hours = db.Column(db.Float, nullable=False)
     actual_hours = db.Column(db.Float, default=0)
-    status = db.Column(db.String(20), default='Not Started')
-    scheduled_date = db.Column(db.Date)
+    status = db.Column(db.String(20), default='Not Started', index=True)
+    scheduled_date = db.Column(db.Date, index=True)
+    schedule_version = db.Column(db.BigInteger, default=0, index=True)  # Bumped whenever scheduled_date changes
     completed_at = db.Column(db.DateTime)
+    row_hash = db.Column(db.BigInteger)  # Fingerprint of the last imported SAP row
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Completed operations past ARCHIVE_RETENTION_DAYS, and the work orders and
+# jobs they leave empty, are moved here by archive.archive_completed. Rows keep
+# their original ids, so operation_archive.work_order_id points into either
+# work_order or work_order_archive and has no foreign key.
+class JobArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    job_number = db.Column(db.String(50), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class WorkOrderArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    work_order_number = db.Column(db.String(50), unique=True, nullable=False)
+    job_id = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class OperationArchive(db.Model):
+    # Keyed by work order number so imports can recognize archived operations without a join
+    __table_args__ = (db.UniqueConstraint('work_order_number', 'operation_number',
+                                          name='uq_operation_archive_work_order_op'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    operation_number = db.Column(db.Integer, nullable=False)
+    work_order_id = db.Column(db.Integer, nullable=False, index=True)
+    work_order_number = db.Column(db.String(50), nullable=False)
+    work_center = db.Column(db.String(50), nullable=False, index=True)
+    planned_hours = db.Column(db.Float, nullable=False)
+    actual_hours = db.Column(db.Float, default=0)
+    status = db.Column(db.String(20))
+    scheduled_date = db.Column(db.Date)
+    schedule_version = db.Column(db.BigInteger, default=0)
+    completed_at = db.Column(db.DateTime, index=True)
+    row_hash = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+PURCHASE_STATUSES = ['Open', 'In Transit', 'Delivered', 'Delayed']
+
+class PurchaseOrder(db.Model):
+    # Pages of /api/purchase?status= in PO-number order; also serves lookups by status alone
+    __table_args__ = (db.Index('ix_purchase_order_status_po_number', 'status', 'po_number'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    po_number = db.Column(db.String(50), unique=True, nullable=False)
+    work_order_id = db.Column(db.Integer, db.ForeignKey('work_order.id'), index=True)
+    material = db.Column(db.String(100))
+    quantity = db.Column(db.Float, default=0)
+    value = db.Column(db.Float, default=0)
+    delivery_date = db.Column(db.Date, index=True)
+    status = db.Column(db.String(20), default='Open')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+IMPORT_STATUSES = ['queued', 'running', 'completed', 'failed']
+
+# One row per upload, written as it progresses so that any worker can report
+# on it; rows counts rows processed so far, rejected rows rejected so far
+class ImportRun(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    import_id = db.Column(db.String(32), unique=True)  # Handed to clients polling /api/imports/<id>
+    status = db.Column(db.String(20), default='queued')
+    filename = db.Column(db.String(255))
+    file_hash = db.Column(db.String(64), index=True)  # Set once the import has completed
+    rows_total = db.Column(db.Integer)
+    rows = db.Column(db.Integer, default=0)
+    inserted = db.Column(db.Integer, default=0)
+    updated = db.Column(db.Integer, default=0)
+    unchanged = db.Column(db.Integer, default=0)
+    removed = db.Column(db.Integer, default=0)
+    rejected = db.Column(db.Integer, default=0)
+    rejects = db.Column(db.Text)  # JSON list of the rejected rows and reasons
+    skipped = db.Column(db.Boolean, default=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+class WorkCenterSummary(db.Model):
+    work_center = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    planned = db.Column(db.Float, nullable=False, default=0)
+    actual = db.Column(db.Float, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_planned = db.Column(db.Float, nullable=False, default=0)
+    completed_actual = db.Column(db.Float, nullable=False, default=0)
+    remaining_planned = db.Column(db.Float, nullable=False, default=0)
+    ready_count = db.Column(db.Integer, nullable=False, default=0)
+    not_started_count = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Single row (id 1) counting data changes, so every worker process drops the
+# response cache entries and ETags made before the latest change
+class DataVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class SchemaMigration(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ChangeEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON sent as the SSE data field
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -0,0 +1,208 @@
+from app import app, db
+from models import Job, WorkOrder, Operation, PurchaseOrder
+from cache import get_cache_backend
+from archive import archived_operation_keys, restore_parents
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.engine import Engine
+from datetime import date, timedelta
+import click
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ['Not Started', 'Ready', 'In Progress', 'Completed']
+
+
+def hot_paths():
+    """The filtered routes and lookups to check, with the tables each must reach through an index.
+
+    Routes are requested through the test client, so the statements checked
+    are exactly the ones the views send. Full-table aggregations (rollup
+    rebuilds, the whole-shop forecast, scheduler loads and the purchase
+    metrics on a first page) read every row by design and are not listed.
+    """
+    work_center = db.session.execute(select(Operation.work_center).limit(1)).scalar() or 'WC'
+    stored = db.session.execute(select(Operation.work_order_id, Operation.operation_number).limit(1)).first()
+    po_number = db.session.execute(select(PurchaseOrder.po_number).limit(1)).scalar() or '0'
+    today = date.today()
+    start, end = today.isoformat(), (today + timedelta(days=42)).isoformat()
+
+    def get(url):
+        def request_route():
+            response = app.test_client().get(url)
+            response.get_data()  # Streamed responses run their queries while the body is read
+            if response.status_code != 200:
+                raise ValueError(f"{url} answered {response.status_code}")
+        return request_route
+
+    paths = {
+        '/api/jobs?work_center=': (get(f'/api/jobs?limit=50&work_center={work_center}'),
+                                   ['job', 'work_order', 'operation']),
+        '/api/jobs?status=': (get('/api/jobs?limit=50&status=Ready'), ['job', 'work_order', 'operation']),
+        '/api/jobs?after=': (get('/api/jobs?limit=50&after=1'), ['job', 'work_order', 'operation']),
+        '/api/schedule?start=&end=': (get(f'/api/schedule?start={start}&end={end}'), ['operation']),
+        '/api/schedule?work_center=': (get(f'/api/schedule?work_center={work_center}'), ['operation']),
+        '/api/schedule?since=': (get('/api/schedule?since=1'), ['operation']),
+        '/api/forecast?work_center=': (get(f'/api/forecast?work_center={work_center}&detail=1'), ['operation']),
+        '/api/work_centers?work_center=': (get(f'/api/work_centers?work_center={work_center}'),
+                                           ['work_center_summary']),
+        '/api/purchase?after=': (get(f'/api/purchase?after={po_number}'), ['purchase_order']),
+        '/api/purchase?status=&after=': (get(f'/api/purchase?status=Open&after={po_number}'), ['purchase_order']),
+        '/api/export/operations.csv?work_center=': (
+            get(f'/api/export/operations.csv?work_center={work_center}'), ['work_order', 'operation']),
+        '/api/export/operations.csv?start=&end=': (
+            get(f'/api/export/operations.csv?start={start}&end={end}'), ['work_order', 'operation']),
+        '/api/export/jobs.csv?work_center=': (get(f'/api/export/jobs.csv?work_center={work_center}'),
+                                              ['job', 'work_order', 'operation']),
+        '/api/export/forecast.csv?work_center=': (get(f'/api/export/forecast.csv?work_center={work_center}'),
+                                                  ['work_center_summary']),
+        'importer archived lookup': (lambda: archived_operation_keys(['1', '2', '3']), ['operation_archive']),
+        'archive restore lookup': (lambda: restore_parents(['1', '2', '3'], ['1', '2', '3']),
+                                   ['job_archive', 'work_order_archive']),
+    }
+    if stored:
+        # Inserting a stored operation again takes the importer's conflict path
+        from importer import insert_operations  # Pulls in pandas, which the web workers otherwise skip
+        row = {'work_order_id': stored.work_order_id, 'operation_number': stored.operation_number,
+               'work_center': work_center, 'planned_hours': 0.0, 'actual_hours': 0.0, 'status': 'Not Started'}
+        paths['importer conflict lookup'] = (lambda: insert_operations([row]), ['operation'])
+    return paths
+
+
+def capture_statements(run):
+    """Call ``run`` and return the ``(statement, parameters)`` of every SELECT it sent, on any engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    run()  # Warm up: a first request may build the shared snapshot, a full read by design
+    get_cache_backend().clear()  # Cached responses would not query at all
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+        db.session.rollback()  # Lookups that write (restoring archived rows) are only being explained
+    return statements
+
+
+def _walk_postgres_plan(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk_postgres_plan(child)
+
+
+def _first_rows_only(statement):
+    # An unfiltered LIMIT query reads only the first rows in index order, whatever the plan calls it
+    words = statement.upper().split()
+    return 'WHERE' not in words and 'LIMIT' in words
+
+
+def sequential_scans(statement, parameters, tables):
+    """Run EXPLAIN on a captured statement and return the plan text and which of ``tables`` it scans in full.
+
+    On PostgreSQL sequential scans are disabled for the check, so the planner
+    only falls back to one when no index can serve the query at all, whatever
+    the size of the data.
+    """
+    dialect = db.session.get_bind().dialect.name
+    connection = db.session.connection()
+    if _first_rows_only(statement):
+        tables = []
+
+    if dialect == 'sqlite':
+        details = [row[3] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+        scanned = [table for table in tables
+                   if any(detail.split()[:2] == ['SCAN', table] for detail in details)]
+        return '; '.join(details), scanned
+
+    if dialect == 'postgresql':
+        try:
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        finally:
+            db.session.rollback()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(_walk_postgres_plan(plan[0]['Plan']))
+        scanned = [table for table in tables
+                   if any(n['Node Type'] == 'Seq Scan' and n.get('Relation Name') == table for n in nodes)]
+        return ' -> '.join(n['Node Type'] for n in nodes), scanned
+
+    raise ValueError(f"Query plan checks are not supported on {dialect}")
+
+
+def check_query_plans():
+    """EXPLAIN every statement of every hot path; returns {name: [(plan, tables scanned in full), ...]}"""
+    return {name: [sequential_scans(statement, parameters, tables)
+                   for statement, parameters in capture_statements(run)]
+            for name, (run, tables) in hot_paths().items()}
+
+
+def full_scans():
+    """``(name, plan, tables)`` of each hot-path statement that scans a table in full; empty when none does"""
+    return [(name, plan, scanned) for name, plans in check_query_plans().items()
+            for plan, scanned in plans if scanned]
+
+
+def seed_synthetic_data(operations, ops_per_work_order=10, work_orders_per_job=3, work_centers=40):
+    """Fill an empty database with synthetic jobs, work orders and operations"""
+    if db.session.execute(select(Operation.id).limit(1)).first():
+        raise ValueError("The database already has operations; seed a scratch database instead")
+
+    work_order_count = -(-operations // ops_per_work_order)
+    job_count = -(-work_order_count // work_orders_per_job)
+    today = date.today()
+
+    for start in range(0, job_count, 5000):
+        db.session.execute(insert(Job), [{'job_number': f'SYN{j:08d}'}
+                                         for j in range(start, min(start + 5000, job_count))])
+    job_ids = dict(db.session.execute(select(Job.job_number, Job.id)).all())
+
+    for start in range(0, work_order_count, 5000):
+        db.session.execute(insert(WorkOrder), [
+            {'work_order_number': f'SYNWO{w:08d}', 'job_id': job_ids[f'SYN{w // work_orders_per_job:08d}']}
+            for w in range(start, min(start + 5000, work_order_count))])
+    work_order_ids = dict(db.session.execute(select(WorkOrder.work_order_number, WorkOrder.id)).all())
+
+    for start in range(0, operations, 5000):
+        rows = []
+        for i in range(start, min(start + 5000, operations)):
+            work_order, op = divmod(i, ops_per_work_order)
+            scheduled = today + timedelta(days=i % 180) if i % 2 else None
+            rows.append({
+                'operation_number': (op + 1) * 10,
+                'work_order_id': work_order_ids[f'SYNWO{work_order:08d}'],
+                'work_center': f'WC{i % work_centers:03d}',
+                'planned_hours': float(i % 16 + 1),
+                'actual_hours': float(i % 7),
+                'status': STATUSES[i % len(STATUSES)],
+                'scheduled_date': scheduled,
+                'schedule_version': i % 50 if scheduled else 0,
+            })
+        db.session.execute(insert(Operation), rows)
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    logger.info(f"🌱 Seeded {operations} synthetic operations")
+
+
+@app.cli.command('check-query-plans')
+@click.option('--seed', type=int, default=0, help='Seed this many synthetic operations first (empty database only).')
+def check_query_plans_command(seed):
+    """EXPLAIN the statements the hot routes send and fail if any scans a table in full."""
+    if seed:
+        seed_synthetic_data(seed)
+    failures = 0
+    for name, plans in check_query_plans().items():
+        for plan, scanned in plans:
+            if scanned:
+                failures += 1
+                click.echo(f"FAIL {name}: full scan of {', '.join(scanned)}\n     {plan}", err=True)
+            else:
+                click.echo(f"ok   {name}: {plan}")
+    if failures:
+        raise click.ClickException(f"{failures} hot-path statements scan a table in full")
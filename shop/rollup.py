@@ -0,0 +1,176 @@
+from app import app, db
+from models import Operation, WorkCenterSummary
+from cache import bump_data_version
+from archive import operation_history
+from sqlalchemy import delete, func, insert, or_, select
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = [
+    'count', 'planned', 'actual', 'completed_count', 'completed_planned', 'completed_actual',
+    'remaining_planned', 'ready_count', 'not_started_count', 'scheduled_count',
+]
+
+
+def work_center_totals():
+    """Per-work-center hour sums and status counts over all operations, archived ones included, in one grouped query"""
+    ops = operation_history.c
+    completed = ops.status == 'Completed'
+    not_completed = or_(ops.status != 'Completed', ops.status.is_(None))
+    query = db.select(
+        ops.work_center,
+        func.count(ops.id),
+        func.coalesce(func.sum(ops.planned_hours), 0.0),
+        func.coalesce(func.sum(ops.actual_hours), 0.0),
+        func.count(ops.id).filter(completed),
+        func.coalesce(func.sum(ops.planned_hours).filter(completed), 0.0),
+        func.coalesce(func.sum(ops.actual_hours).filter(completed), 0.0),
+        func.coalesce(func.sum(ops.planned_hours).filter(not_completed), 0.0),
+        func.count(ops.id).filter(ops.status == 'Ready'),
+        func.count(ops.id).filter(ops.status == 'Not Started'),
+        func.count(ops.scheduled_date),
+    ).group_by(ops.work_center)
+
+    return {row[0]: dict(zip(SUMMARY_FIELDS, row[1:])) for row in db.session.execute(query)}
+
+
+def _with_efficiency(totals):
+    totals['efficiency_factor'] = (totals['completed_actual'] / totals['completed_planned']
+                                   if totals['completed_planned'] else None)
+    return totals
+
+
+def summary_totals():
+    """Per-work-center totals read from the WorkCenterSummary rollup; empty when no operations are stored"""
+    rows = db.session.execute(select(WorkCenterSummary).where(WorkCenterSummary.count > 0)).scalars().all()
+    return {row.work_center: _with_efficiency({field: getattr(row, field) for field in SUMMARY_FIELDS})
+            for row in rows}
+
+
+def summary_for(work_center):
+    """Totals for a single work center, or None if it has no operations"""
+    row = db.session.get(WorkCenterSummary, work_center)
+    if row is None or not row.count:
+        return None
+    return _with_efficiency({field: getattr(row, field) for field in SUMMARY_FIELDS})
+
+
+def contributions(work_center, status, planned, actual, scheduled, sign=1):
+    """Sum what each operation adds to its work center's rollup, grouped by work center.
+
+    Arguments are aligned pandas Series, one entry per operation. Pass ``sign=-1``
+    for the operations' previous values so that old and new can be combined
+    into a single delta.
+    """
+    import pandas as pd  # Only the write paths need pandas; the read helpers above run in every worker
+    status = status.fillna('')
+    planned = planned.fillna(0.0).astype(float)
+    actual = actual.fillna(0.0).astype(float)
+    completed = status == 'Completed'
+    frame = pd.DataFrame({
+        'work_center': work_center.to_numpy(),
+        'count': 1,
+        'planned': planned.to_numpy(),
+        'actual': actual.to_numpy(),
+        'completed_count': completed.astype(int).to_numpy(),
+        'completed_planned': planned.where(completed, 0.0).to_numpy(),
+        'completed_actual': actual.where(completed, 0.0).to_numpy(),
+        'remaining_planned': planned.where(~completed, 0.0).to_numpy(),
+        'ready_count': (status == 'Ready').astype(int).to_numpy(),
+        'not_started_count': (status == 'Not Started').astype(int).to_numpy(),
+        'scheduled_count': scheduled.astype(bool).astype(int).to_numpy(),
+    })
+    return frame.groupby('work_center').sum() * sign
+
+
+def operation_contributions(operation_ids, sign=1):
+    """Contributions of stored operations, loaded in one query"""
+    import pandas as pd
+    if not operation_ids:
+        return None
+    frame = pd.DataFrame(db.session.execute(
+        select(Operation.work_center, Operation.status, Operation.planned_hours,
+               Operation.actual_hours, Operation.scheduled_date.isnot(None))
+        .where(Operation.id.in_(operation_ids))).all(),
+        columns=['work_center', 'status', 'planned_hours', 'actual_hours', 'scheduled'])
+    if frame.empty:
+        return None
+    return contributions(frame['work_center'], frame['status'], frame['planned_hours'],
+                         frame['actual_hours'], frame['scheduled'], sign=sign)
+
+
+def _upsert_add():
+    """INSERT that adds onto an existing summary row, using the dialect's native upsert"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(WorkCenterSummary)
+    table = WorkCenterSummary.__table__
+    return stmt.on_conflict_do_update(
+        index_elements=['work_center'],
+        set_={**{field: table.c[field] + stmt.excluded[field] for field in SUMMARY_FIELDS},
+              'updated_at': func.now()},
+    )
+
+
+def apply_deltas(*deltas):
+    """Add per-work-center deltas to the rollup within the caller's transaction.
+
+    Each delta is a DataFrame indexed by work center (as built by
+    ``contributions``) or a ``{work_center: {field: change}}`` dict.
+    """
+    import pandas as pd
+    frames = [pd.DataFrame.from_dict(d, orient='index') if isinstance(d, dict) else d
+              for d in deltas if d is not None and len(d)]
+    if not frames:
+        return
+    combined = pd.concat(frames).groupby(level=0).sum().reindex(columns=SUMMARY_FIELDS, fill_value=0)
+    rows = [{'work_center': wc, **{field: int(values[field]) if field.endswith('_count') or field == 'count'
+                                   else float(values[field]) for field in SUMMARY_FIELDS}}
+            for wc, values in combined.iterrows()]
+
+    stmt = _upsert_add()
+    if stmt is not None:
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        summary = db.session.get(WorkCenterSummary, row['work_center'])
+        if summary is None:
+            db.session.add(WorkCenterSummary(**row))
+        else:
+            for field in SUMMARY_FIELDS:
+                setattr(summary, field, getattr(summary, field) + row[field])
+    db.session.flush()
+
+
+def write_work_center_summary():
+    """Replace the rollup with totals recomputed from operation_history, within the caller's transaction"""
+    totals = work_center_totals()
+    db.session.execute(delete(WorkCenterSummary))
+    if totals:
+        db.session.execute(insert(WorkCenterSummary),
+                           [{'work_center': wc, **values} for wc, values in totals.items()])
+    return len(totals)
+
+
+def rebuild_work_center_summary():
+    """Recompute the whole rollup from operation_history"""
+    count = write_work_center_summary()
+    db.session.commit()
+    bump_data_version()
+    logger.info(f"✅ Rebuilt work center summary for {count} work centers")
+    return count
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the WorkCenterSummary rollup from scratch."""
+    count = rebuild_work_center_summary()
+    click.echo(f"Rebuilt rollups for {count} work centers")
@@ -1,17 +1,30 @@
 import os
-import pandas as pd
-from flask import render_template, request, jsonify
+import uuid
+from flask import render_template, request, jsonify, Response
 from app import app, db
-from models import Job, WorkOrder, Operation
-from utils import process_sapdata, calculate_forecast
+from models import Job, WorkOrder, Operation, PurchaseOrder, PURCHASE_STATUSES
+from utils import forecast_row, work_center_row
+from rollup import summary_for, summary_totals
+from cache import cached_response
+from serialization import STREAM_BATCH_ROWS, columns_response, stream_json_array, wants_columns
+from events import missed_events, stream_events, subscribe
 from datetime import datetime, timedelta
+from sqlalchemy import func
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
 import logging
 
+# Views on the import, scheduling and analytics paths import their modules, and
+# with them pandas/NumPy/openpyxl, on first use so that workers start quickly.
+
 @app.route('/')
 def dashboard():
-    work_centers = db.session.query(Operation.work_center).distinct().all()
-    work_centers = [wc[0] for wc in work_centers]
+    from snapshot import load_snapshot
+    snapshot = load_snapshot()
+    if snapshot is not None:
+        work_centers = snapshot['meta']['work_centers']
+    else:
+        work_centers = [wc[0] for wc in db.session.query(Operation.work_center).distinct().all()]
     return render_template('dashboard.html', work_centers=work_centers)
 
 @app.route('/scheduling')
@@ -30,161 +43,346 @@ def work_centers():
 def purchase():
     return render_template('purchase.html')
 
-@app.route('/api/purchase')
-def get_purchase_data():
-    purchase_orders = []
-    for job in db.session.query(Job).all():
-        for wo in job.work_orders:
-            if hasattr(wo, 'purchase_order'):
-                purchase_orders.append({
-                    'po_number': wo.purchase_order,
-                    'material': wo.material,
-                    'quantity': wo.quantity,
-                    'delivery_date': wo.delivery_date.strftime('%Y-%m-%d') if wo.delivery_date else 'N/A',
-                    'status': wo.status,
-                    'value': wo.value or 0
-                })
-
-    metrics = {
-        'open_pos': len([po for po in purchase_orders if po['status'] == 'Open']),
-        'total_value': sum(po['value'] for po in purchase_orders),
-        'pending_deliveries': len([po for po in purchase_orders if po['status'] in ['Open', 'In Transit']]),
-        'late_deliveries': len([po for po in purchase_orders if po['status'] == 'Delayed']),
-        'status_distribution': [
-            len([po for po in purchase_orders if po['status'] == 'Open']),
-            len([po for po in purchase_orders if po['status'] == 'In Transit']),
-            len([po for po in purchase_orders if po['status'] == 'Delivered']),
-            len([po for po in purchase_orders if po['status'] == 'Delayed'])
-        ]
+PURCHASE_PAGE_SIZE = 100
+PENDING_PO_STATUSES = ['Open', 'In Transit']
+TIMELINE_DAYS = 90  # Pending deliveries shown up to this many days ahead (overdue ones included)
+
+def _purchase_metrics(today):
+    """PO metrics from one grouped query over status"""
+    overdue = (PurchaseOrder.status.in_(PENDING_PO_STATUSES)) & (PurchaseOrder.delivery_date < today)
+    by_status = {status: (count, value, late) for status, count, value, late in db.session.execute(
+        db.select(PurchaseOrder.status, func.count(PurchaseOrder.id),
+                  func.coalesce(func.sum(PurchaseOrder.value), 0.0),
+                  func.count(PurchaseOrder.id).filter(overdue))
+        .group_by(PurchaseOrder.status))}
+
+    def count(status):
+        return by_status.get(status, (0, 0.0, 0))[0]
+
+    return {
+        'open_pos': count('Open'),
+        'total_value': float(sum(value for _, value, _ in by_status.values())),
+        'pending_deliveries': sum(count(status) for status in PENDING_PO_STATUSES),
+        'late_deliveries': count('Delayed') + sum(late for _, _, late in by_status.values()),
+        'status_distribution': [count(status) for status in PURCHASE_STATUSES],
     }
 
-    timeline_data = {
-        'dates': [],
-        'quantities': []
+def _delivery_timeline(today):
+    """Quantity still to be delivered per delivery date, from one grouped query"""
+    rows = db.session.execute(
+        db.select(PurchaseOrder.delivery_date, func.coalesce(func.sum(PurchaseOrder.quantity), 0.0))
+        .where(PurchaseOrder.status != 'Delivered',
+               PurchaseOrder.delivery_date <= today + timedelta(days=TIMELINE_DAYS))
+        .group_by(PurchaseOrder.delivery_date)
+        .order_by(PurchaseOrder.delivery_date)).all()
+    return {
+        'dates': [day.isoformat() for day, _ in rows],
+        'quantities': [float(quantity) for _, quantity in rows]
     }
-    
-    return jsonify({
-        'purchase_orders': purchase_orders,
-        'metrics': metrics,
-        'timeline': timeline_data
-    })
+
+@app.route('/api/purchase')
+@cached_response
+def get_purchase_data():
+    """Purchase orders with metrics and the delivery timeline.
+
+    The list is ordered by PO number and keyset paginated on it: ``limit``
+    (default 100) and ``after`` (a PO number), with the next ``after`` value
+    in ``X-Next-Cursor``; ``status`` filters it. Metrics and timeline are
+    included on the first page only.
+    """
+    limit = min(request.args.get('limit', PURCHASE_PAGE_SIZE, type=int) or PURCHASE_PAGE_SIZE, 1000)
+    after = request.args.get('after')
+
+    query = (db.select(PurchaseOrder.po_number, PurchaseOrder.material, PurchaseOrder.quantity,
+                       PurchaseOrder.delivery_date, PurchaseOrder.status, PurchaseOrder.value)
+             .order_by(PurchaseOrder.po_number).limit(limit))
+    if after is not None:
+        query = query.where(PurchaseOrder.po_number > after)
+    if request.args.get('status'):
+        query = query.where(PurchaseOrder.status == request.args['status'])
+    rows = db.session.execute(query).all()
+
+    purchase_orders = [{
+        'po_number': po_number,
+        'material': material,
+        'quantity': quantity,
+        'delivery_date': delivery_date.strftime('%Y-%m-%d') if delivery_date else 'N/A',
+        'status': status,
+        'value': value or 0
+    } for po_number, material, quantity, delivery_date, status, value in rows]
+
+    data = {'purchase_orders': purchase_orders}
+    if after is None:
+        today = datetime.utcnow().date()
+        data['metrics'] = _purchase_metrics(today)
+        data['timeline'] = _delivery_timeline(today)
+
+    response = jsonify(data)
+    if len(rows) == limit:
+        response.headers['X-Next-Cursor'] = quote(rows[-1].po_number)  # Ready to put in the URL as is
+    return response
+
+JOB_FIELDS = ['job_number', 'status', 'start_date', 'due_date', 'work_orders']
+
+# Columns of /api/jobs?format=columns: one entry per operation, or per job/work order without any
+JOB_COLUMNS = ['job_number', 'work_order_number', 'operation_number', 'work_center', 'planned_hours',
+               'actual_hours', 'status', 'scheduled_date', 'completed_at']
+
+OPERATION_COLUMNS = (Operation.id, Operation.operation_number, Operation.work_center, Operation.planned_hours,
+                     Operation.actual_hours, Operation.status, Operation.scheduled_date, Operation.completed_at)
+
+def _job_tree_query(op_filters, *columns):
+    """Jobs, work orders and operations as one flat, ordered query; filters keep only matching operations"""
+    query = db.select(*columns).select_from(Job)
+    if op_filters:
+        query = (query.join(WorkOrder, WorkOrder.job_id == Job.id)
+                 .join(Operation, Operation.work_order_id == WorkOrder.id).where(*op_filters))
+    else:
+        query = (query.outerjoin(WorkOrder, WorkOrder.job_id == Job.id)
+                 .outerjoin(Operation, Operation.work_order_id == WorkOrder.id))
+    return query.order_by(Job.id, WorkOrder.id, Operation.id)
+
+def _jobs_with_operations(op_filters):
+    return Job.id.in_(db.select(WorkOrder.job_id).join(Operation, Operation.work_order_id == WorkOrder.id)
+                      .where(*op_filters))
+
+def _nest_jobs(rows, fields):
+    """Fold flat tree rows into one job dict at a time, yielding each job once its rows are done"""
+    job_id = job = None
+    work_order_id = None
+    for (row_job_id, job_number, wo_id, wo_number, op_id, op_number, work_center, planned, actual,
+         status, scheduled_date, completed_at) in rows:
+        if row_job_id != job_id:
+            if job is not None:
+                yield {field: job[field] for field in fields}
+            job_id, work_order_id = row_job_id, None
+            # Job summary comes from its first work order's first operation
+            job = {'job_number': job_number, 'status': status if op_id is not None else "Unknown",
+                   'start_date': scheduled_date, 'due_date': completed_at, 'work_orders': []}
+
+        if wo_id is None:
+            continue
+        if wo_id != work_order_id:
+            work_order_id = wo_id
+            job['work_orders'].append({'work_order_number': wo_number, 'operations': []})
+        if op_id is not None:
+            job['work_orders'][-1]['operations'].append({
+                'operation_number': op_number,
+                'work_center': work_center,
+                'planned_hours': planned,
+                'actual_hours': actual,
+                'status': status,
+                'scheduled_date': scheduled_date,
+                'completed_at': completed_at
+            })
+    if job is not None:
+        yield {field: job[field] for field in fields}
 
 @app.route('/api/jobs')
+@cached_response
 def get_jobs():
-    """Fetch all jobs with work orders & operations"""
-    jobs = Job.query.all()
-
-    # Debugging logs
-    logging.info(f"📌 Found {len(jobs)} jobs in database")
-
-    if not jobs:
-        return jsonify([])  # Return empty list if no jobs exist
-
-    result = []
-
-    for job in jobs:
-        job_data = {
-            'job_number': job.job_number,
-            'status': job.work_orders[0].operations[0].status if job.work_orders else "Unknown",
-            'start_date': job.work_orders[0].operations[0].scheduled_date.isoformat() if job.work_orders and job.work_orders[0].operations[0].scheduled_date else None,
-            'due_date': job.work_orders[0].operations[0].completed_at.isoformat() if job.work_orders and job.work_orders[0].operations[0].completed_at else None,
-            'work_orders': []
-        }
-
-        for wo in job.work_orders:
-            work_order_data = {
-                'work_order_number': wo.work_order_number,
-                'operations': []
-            }
-
-            for op in wo.operations:
-                operation_data = {
-                    'operation_number': op.operation_number,
-                    'work_center': op.work_center,
-                    'planned_hours': op.planned_hours,
-                    'actual_hours': op.actual_hours,
-                    'status': op.status,
-                    'scheduled_date': op.scheduled_date.isoformat() if op.scheduled_date else None,
-                    'completed_at': op.completed_at.isoformat() if op.completed_at else None
-                }
-                work_order_data['operations'].append(operation_data)
-
-            job_data['work_orders'].append(work_order_data)
-
-        result.append(job_data)
-
-    logging.info(f"📌 API `/api/jobs` returned {len(result)} jobs")
-    return jsonify(result)
-
+    """Fetch jobs with work orders & operations.
+
+    Query args: ``limit`` and ``after`` (a job id) for keyset pagination,
+    ``work_center`` and ``status`` to filter operations, and ``fields`` (comma
+    separated) to pick job fields. When a page is full, the ``after`` value
+    for the next page is returned in the ``X-Next-Cursor`` header.
+
+    Jobs are streamed as they are read from a server-side cursor, so these
+    responses skip the response cache. ``format=columns`` returns the flat
+    operation rows instead, as one array per ``JOB_COLUMNS`` field; those
+    are much smaller and are cached.
+    """
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after', type=int)
+    fields = request.args.get('fields')
+    fields = [f for f in fields.split(',') if f in JOB_FIELDS] if fields else JOB_FIELDS
+
+    op_filters = []
+    if request.args.get('work_center'):
+        op_filters.append(Operation.work_center == request.args['work_center'])
+    if request.args.get('status'):
+        op_filters.append(Operation.status == request.args['status'])
+
+    job_filters = []
+    if after is not None:
+        job_filters.append(Job.id > after)
+    next_cursor = None
+    if limit:
+        # The page's last id bounds the tree query and goes out in the headers before the body
+        page_query = db.select(Job.id).where(*job_filters).order_by(Job.id).limit(limit)
+        if op_filters:
+            page_query = page_query.where(_jobs_with_operations(op_filters))
+        page = db.session.scalars(page_query).all()
+        if not page:
+            return columns_response([], JOB_COLUMNS) if wants_columns() else jsonify([])
+        job_filters.append(Job.id <= page[-1])
+        if len(page) == limit:
+            next_cursor = str(page[-1])
+
+    if wants_columns():
+        rows = db.session.execute(_job_tree_query(
+            op_filters, Job.job_number, WorkOrder.work_order_number, *OPERATION_COLUMNS[1:]).where(*job_filters))
+        response = columns_response(rows, JOB_COLUMNS)
+    elif set(fields) - {'job_number'}:
+        tree_query = _job_tree_query(op_filters, Job.id, Job.job_number, WorkOrder.id, WorkOrder.work_order_number,
+                                     *OPERATION_COLUMNS)
+        rows = db.session.execute(tree_query.where(*job_filters).execution_options(yield_per=STREAM_BATCH_ROWS))
+        response = stream_json_array(_nest_jobs(rows, fields))
+    else:
+        job_query = db.select(Job.job_number).where(*job_filters).order_by(Job.id)
+        if op_filters:
+            job_query = job_query.where(_jobs_with_operations(op_filters))
+        rows = db.session.execute(job_query.execution_options(yield_per=STREAM_BATCH_ROWS))
+        response = stream_json_array({'job_number': job_number} for job_number, in rows)
+
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def _requested_totals():
+    """Rollup totals for every work center, or a single-row lookup when ?work_center= is given"""
+    work_center = request.args.get('work_center')
+    if work_center:
+        totals = summary_for(work_center)
+        return {work_center: totals} if totals else {}
+    return summary_totals()
 
 @app.route('/api/forecast')
+@cached_response
 def get_forecast():
-    work_centers = db.session.query(Operation.work_center).distinct().all()
-    forecast_data = {}
-
-    for wc in work_centers:
-        work_center = wc[0]
-        operations = Operation.query.filter_by(work_center=work_center).all()
-
-        planned = sum(op.planned_hours for op in operations)
-        actual = sum(op.actual_hours for op in operations)
-        remaining = planned - actual
-        forecasted = calculate_forecast(operations)
+    """Forecast per work center; ``?detail=1`` adds efficiency trends and horizon forecasts"""
+    if request.args.get('detail'):
+        from forecasting import HORIZONS, forecast_work_centers, load_operations_frame
+        horizons = request.args.get('horizons')
+        if horizons:
+            horizons = {name: HORIZONS[name] for name in horizons.split(',') if name in HORIZONS}
+        frame = load_operations_frame(request.args.get('work_center'))
+        return jsonify(forecast_work_centers(frame, horizons=horizons or None))
+
+    forecast_data = {work_center: forecast_row(totals) for work_center, totals in _requested_totals().items()}
+    return jsonify(forecast_data)
 
-        forecast_data[work_center] = {
-            "planned": planned,
-            "actual": actual,
-            "forecasted": forecasted,
-            "remaining": remaining
-        }
+def _parse_day(value):
+    """Date from YYYY-MM-DD or a full ISO timestamp (as sent by FullCalendar)"""
+    return datetime.strptime(value[:10], '%Y-%m-%d').date() if value else None
 
-    return jsonify(forecast_data)
+SCHEDULE_COLUMNS = ['id', 'work_order_number', 'operation_number', 'start', 'work_center']
 
 @app.route('/api/schedule', methods=['GET', 'POST'])
+@cached_response
 def schedule():
+    """Scheduled operations as calendar events.
+
+    GET accepts ``start``/``end`` (end exclusive) and ``work_center`` to limit
+    the window, and ``since`` to return only operations rescheduled after that
+    schedule version. The current version is sent in ``X-Schedule-Version``.
+    ``format=columns`` returns one array per ``SCHEDULE_COLUMNS`` field
+    instead of event objects, leaving the client to build the titles.
+    """
+    from scheduler import apply_schedule_changes, current_schedule_version
     if request.method == 'POST':
-        data = request.json
-        operation = Operation.query.get(data['operation_id'])
-        if operation:
-            operation.scheduled_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            db.session.commit()
+        data = request.get_json(silent=True)
+        try:
+            changes = {int(data['operation_id']): _parse_day(data['date'])}
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"status": "error", "message": "Send operation_id and a YYYY-MM-DD date"}), 400
+        missing = apply_schedule_changes(changes)
+        if not missing:
             return jsonify({"status": "success"})
         return jsonify({"status": "error", "message": "Operation not found"}), 404
 
-    operations = Operation.query.filter(Operation.scheduled_date.isnot(None)).all()
+    try:
+        start = _parse_day(request.args.get('start'))
+        end = _parse_day(request.args.get('end'))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Dates must be YYYY-MM-DD"}), 400
+    since = request.args.get('since', type=int)
+
+    # Read the version first so changes committed meanwhile are re-sent rather than missed
+    version = current_schedule_version()
+    query = (db.select(Operation.id, WorkOrder.work_order_number, Operation.operation_number,
+                       Operation.scheduled_date, Operation.work_center)
+             .join(WorkOrder, Operation.work_order_id == WorkOrder.id)
+             .where(Operation.scheduled_date.isnot(None)))
+    if start:
+        query = query.where(Operation.scheduled_date >= start)
+    if end:
+        query = query.where(Operation.scheduled_date < end)
+    if request.args.get('work_center'):
+        query = query.where(Operation.work_center == request.args['work_center'])
+    if since is not None:
+        query = query.where(Operation.schedule_version > since)
+
+    rows = db.session.execute(query)
+    if wants_columns():
+        response = columns_response(rows, SCHEDULE_COLUMNS)
+        response.headers['X-Schedule-Version'] = str(version)
+        return response
+
     events = [{
-        "id": op.id,
-        "title": f"{op.work_order.work_order_number} - Op {op.operation_number}",
-        "start": op.scheduled_date.isoformat(),
-        "work_center": op.work_center
-    } for op in operations]
-    return jsonify(events)
+        "id": op_id,
+        "title": f"{work_order_number} - Op {operation_number}",
+        "start": scheduled_date.isoformat(),
+        "work_center": work_center
+    } for op_id, work_order_number, operation_number, scheduled_date, work_center in rows]
+    response = jsonify(events)
+    response.headers['X-Schedule-Version'] = str(version)
+    return response
+
+@app.route('/api/schedule/update', methods=['POST'])
+def update_schedule():
+    """Apply many ``{operation_id, date}`` changes in one transaction"""
+    from scheduler import apply_schedule_changes
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('changes', []), list):
+        return jsonify({"status": "error", "message": "Send a JSON object with a list of changes"}), 400
+    try:
+        changes = {int(change['operation_id']): _parse_day(change['date']) for change in data.get('changes', [])}
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Each change needs operation_id and a YYYY-MM-DD date"}), 400
+
+    missing = apply_schedule_changes(changes) if changes else []
+    return jsonify({"status": "success", "updated": len(changes) - len(missing), "missing": missing})
+
+@app.route('/api/schedule/auto', methods=['POST'])
+def auto_schedule_operations():
+    """Schedule every open operation by precedence and work-center capacity.
+
+    JSON body (all optional): ``start`` (YYYY-MM-DD), ``dry_run``,
+    ``default_capacity`` and ``capacity`` ({work_center: hours per day}).
+    """
+    from scheduler import auto_schedule
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Send a JSON object"}), 400
+    try:
+        start = datetime.strptime(data['start'], '%Y-%m-%d').date() if data.get('start') else None
+        result = auto_schedule(
+            start=start,
+            capacity={wc: float(hours) for wc, hours in (data.get('capacity') or {}).items()},
+            default_capacity=float(data['default_capacity']) if data.get('default_capacity') else None,
+            dry_run=bool(data.get('dry_run'))
+        )
+    except (ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"status": "success", **result})
 
 @app.route('/api/work_centers')
+@cached_response
 def get_work_centers():
-    work_centers = db.session.query(Operation.work_center).distinct().all()
-    result = {}
-
-    for wc in work_centers:
-        work_center = wc[0]
-        operations = Operation.query.filter_by(work_center=work_center).all()
-
-        available = len([op for op in operations if op.status == 'Ready'])
-        backlog = len([op for op in operations if op.status == 'Not Started'])
-        total_planned = sum(op.planned_hours for op in operations) or 1
-        total_actual = sum(op.actual_hours for op in operations)
-        efficiency = round((total_actual / total_planned) * 100)
-
-        result[work_center] = {
-            "available_work": available,
-            "backlog": backlog,
-            "efficiency": f"{efficiency}%"
-        }
-
+    result = {work_center: work_center_row(totals) for work_center, totals in _requested_totals().items()}
     return jsonify(result)
 
 @app.route('/upload', methods=['POST'])
 def upload_sapdata():
+    """Queue uploaded SAPDATA for import.
+
+    One .xlsx file is streamed in from its first sheet. Several files, or a
+    .zip of them, make a batch import: every sheet of every workbook is
+    parsed in parallel and the merged result is written in one pass.
+    """
     try:
         logging.info("📂 Starting file upload process...")
 
@@ -192,58 +390,122 @@ def upload_sapdata():
             logging.error("❌ No file part in request")
             return jsonify({"error": "No file provided"}), 400
 
-        file = request.files['file']
-        logging.info(f"📌 Received file: {file.filename}")
+        files = [file for file in request.files.getlist('file') if file.filename != '']
+        logging.info(f"📌 Received files: {', '.join(file.filename for file in files)}")
 
-        if file.filename == '':
+        if not files:
             logging.error("❌ No selected file")
             return jsonify({"error": "No file selected"}), 400
 
-        if not file.filename.endswith('.xlsx'):
-            logging.error(f"❌ Invalid file format: {file.filename}")
-            return jsonify({"error": "Invalid file format. Please upload an Excel (.xlsx) file"}), 400
+        batch = len(files) > 1 or files[0].filename.lower().endswith('.zip')
+        for file in files:
+            if not file.filename.lower().endswith(('.xlsx', '.zip')):
+                logging.error(f"❌ Invalid file format: {file.filename}")
+                return jsonify({"error": "Invalid file format. Please upload Excel (.xlsx) files or a .zip of them"}), 400
 
         # Ensure upload folder exists
         if not os.path.exists(app.config['UPLOAD_FOLDER']):
             os.makedirs(app.config['UPLOAD_FOLDER'])
             logging.info(f"📁 Created upload folder: {app.config['UPLOAD_FOLDER']}")
 
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        logging.info(f"📂 Saving file to: {filepath}")
-
+        uploads = []
         try:
-            # Save file
-            file.save(filepath)
-            logging.info("✅ File saved successfully")
-
-            # Open the file using `with` statement to ensure it gets closed properly
-            with open(filepath, "rb") as f:
-                df = pd.read_excel(f, engine='openpyxl')
-
-            logging.info(f"📊 Excel file loaded. Columns found: {df.columns.tolist()}")
-            print(df.head())  # Print first few rows for debugging
-
-            # Process the data
-            process_sapdata(df)
-            logging.info("✅ Data processed successfully")
-
-            # Remove the file after processing
-            if os.path.exists(filepath):  # Check if file exists before deleting
-                os.remove(filepath)
-                logging.info("🗑️ Temporary file removed")
-
-            return jsonify({"status": "success", "message": "Data imported successfully"})
+            for file in files:
+                # Prefix with a random token so concurrent uploads of the same file don't collide
+                filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                logging.info(f"📂 Saving file to: {filepath}")
+                uploads.append((filepath, file.filename))
+                file.save(filepath)
+            logging.info("✅ Files saved successfully")
+
+            # The import runs on a background worker; clients poll /api/imports/<id>
+            from import_queue import submit_batch_import, submit_import
+            import_id = submit_batch_import(uploads) if batch else submit_import(*uploads[0])
+
+            return jsonify({
+                "status": "queued",
+                "message": "Files queued for batch import" if batch else "File queued for import",
+                "import_id": import_id
+            }), 202
 
         except Exception as e:
             logging.error(f"❌ Error during file processing: {str(e)}")
 
-            # Remove file only if it exists
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            # Remove files only if they exist
+            for filepath, _ in uploads:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
 
-            return jsonify({"error": f"Error processing file: {str(e)}"}), 500
+            return jsonify({"error": f"Error queuing file: {str(e)}"}), 500
 
     except Exception as e:
         logging.error(f"❌ Upload error: {str(e)}")
         return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stream')
+def stream_changes():
+    """Server-Sent Events: ``import`` and ``schedule`` change events carrying updated rollups.
+
+    Browsers reconnect with ``Last-Event-ID`` and receive what they missed, or
+    a ``reload`` event once those events have been pruned. gunicorn.conf.py
+    picks gevent workers when the database driver cooperates with them, so
+    idle connections don't hold threads; threaded workers need one per stream.
+    """
+    subscriber = subscribe()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    backlog = missed_events(last_event_id) if last_event_id is not None else []
+    response = Response(stream_events(subscriber, backlog, last_event_id or 0), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+@app.route('/api/preview', methods=['POST'])
+def preview_sapdata():
+    """Analyse an uploaded SAPDATA file in memory without writing anything to the database.
+
+    The response is streamed: work-center statistics first, then the job
+    records in chunks. Pass ``?jobs=0`` for the statistics alone.
+    """
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({"error": "No file provided"}), 400
+    if not file.filename.endswith('.xlsx'):
+        return jsonify({"error": "Invalid file format. Please upload an Excel (.xlsx) file"}), 400
+
+    import pandas as pd
+    from excel_processor import ALL_ALTERNATIVES, process_sap_data
+    try:
+        df = pd.read_excel(file.stream, usecols=lambda col: str(col).strip().lower() in ALL_ALTERNATIVES)
+        result = process_sap_data(df)
+    except KeyError as e:
+        return jsonify({"error": str(e.args[0])}), 400
+    except Exception as e:
+        logging.error(f"❌ Preview error: {str(e)}")
+        return jsonify({"error": f"Could not read file: {str(e)}"}), 400
+
+    include_jobs = request.args.get('jobs', '1') != '0'
+
+    def generate():
+        yield (f'{{"filename": {app.json.dumps(file.filename)}, "rows": {result["rows"]}, '
+               f'"orders": {result["orders"]}, "work_centers": {app.json.dumps(result["work_centers"])}')
+        if include_jobs:
+            yield ', "jobs": ['
+            first = True
+            for chunk in result['jobs']:
+                if chunk:
+                    yield ('' if first else ',') + app.json.dumps(chunk)[1:-1]
+                    first = False
+            yield ']'
+        yield '}'
+
+    return Response(generate(), mimetype='application/json')
+
+@app.route('/api/imports/<import_id>')
+def get_import(import_id):
+    """Report progress of a queued upload"""
+    from import_queue import get_import_status
+    status = get_import_status(import_id)
+    if status is None:
+        return jsonify({"error": "Import not found"}), 404
+    return jsonify(status)
@@ -0,0 +1,198 @@
+from app import app, db
+from models import Operation
+from rollup import apply_deltas
+from cache import bump_data_version
+from snapshot import schedule_refresh
+from events import MAX_EVENT_CHANGES, publish_event
+from sqlalchemy import func, or_, select, update
+from datetime import date
+import numpy as np
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def current_schedule_version():
+    """Highest Operation.schedule_version; clients pass the last one they saw as ?since="""
+    return db.session.execute(select(func.max(Operation.schedule_version))).scalar() or 0
+
+
+def _scheduled_count_deltas(moves):
+    """Rollup ``scheduled_count`` changes from ``(work_center, old date, new date)`` per operation"""
+    deltas = {}
+    for work_center, old, new in moves:
+        delta = (new is not None) - (old is not None)
+        if delta:
+            deltas[work_center] = deltas.get(work_center, 0) + delta
+    return {wc: {'scheduled_count': n} for wc, n in deltas.items() if n}
+
+
+def apply_schedule_changes(changes):
+    """Set the scheduled date of many operations in one transaction with a single bulk UPDATE.
+
+    ``changes`` maps operation id to date. Returns the ids that do not exist.
+    """
+    ids = list(changes)
+    existing = {}
+    for start in range(0, len(ids), 5000):
+        existing.update({op_id: (work_center, scheduled) for op_id, work_center, scheduled in db.session.execute(
+            select(Operation.id, Operation.work_center, Operation.scheduled_date)
+            .where(Operation.id.in_(ids[start:start + 5000])))})
+    missing = [op_id for op_id in ids if op_id not in existing]
+    if not existing:
+        return missing
+
+    version = current_schedule_version() + 1
+    db.session.execute(update(Operation), [
+        {'id': op_id, 'scheduled_date': changes[op_id], 'schedule_version': version} for op_id in existing
+    ])
+    apply_deltas(_scheduled_count_deltas((work_center, scheduled, changes[op_id])
+                                         for op_id, (work_center, scheduled) in existing.items()))
+    db.session.commit()
+    bump_data_version()
+    schedule_refresh()
+    _publish_schedule(version, [(op_id, changes[op_id]) for op_id in existing],
+                      {work_center for work_center, _ in existing.values()})
+    logger.info(f"📅 Rescheduled {len(existing)} operations (version {version})")
+    return missing
+
+
+def _publish_schedule(version, dates, work_centers=None):
+    """Tell stream clients about new dates; big batches only carry the version to fetch ?since= from"""
+    changes = None
+    if len(dates) <= MAX_EVENT_CHANGES:
+        changes = [{'id': op_id, 'start': day.isoformat() if day else None} for op_id, day in dates]
+    publish_event('schedule', {'version': version, 'previous_version': version - 1, 'changes': changes},
+                  work_centers=work_centers)
+
+
+def load_open_operations():
+    """Every operation not yet completed, ordered by work order and operation number"""
+    return db.session.execute(
+        select(Operation.id, Operation.work_order_id, Operation.operation_number, Operation.work_center,
+               Operation.planned_hours, Operation.actual_hours, Operation.scheduled_date)
+        .where(or_(Operation.status != 'Completed', Operation.status.is_(None)))
+        .order_by(Operation.work_order_id, Operation.operation_number, Operation.id)
+    ).all()
+
+
+def _finish(day, used, hours, capacity):
+    """Book ``hours`` on a work center whose current day is ``day`` with ``used`` hours taken.
+
+    Returns the (day, used) position after the booking.
+    """
+    room = capacity - used
+    if hours <= room:
+        return day, used + hours
+    full_days, rest = divmod(hours - room, capacity)
+    if rest == 0:
+        return day + int(full_days), capacity
+    return day + int(full_days) + 1, rest
+
+
+def build_schedule(operations, capacity=None, default_capacity=8.0):
+    """List-schedule operations onto work-center days.
+
+    ``operations`` are (id, work_order_id, operation_number, work_center,
+    planned_hours, actual_hours, ...) rows sorted by work order and operation
+    number. An operation becomes ready once its predecessor in the same work
+    order has finished; ready operations are taken from a priority queue
+    ordered by earliest start, then work order, then operation number, and
+    booked into the next free hours of their work center's daily capacity.
+
+    Returns a list of day offsets (from day 0) giving each operation's start day,
+    and the finishing day offset per work center.
+    """
+    capacity = capacity or {}
+    count = len(operations)
+    successor = [-1] * count
+    ready = []
+    for i, op in enumerate(operations):
+        if i and operations[i - 1][1] == op[1]:
+            successor[i - 1] = i
+        else:
+            ready.append((0, op[1], op[2], i))
+    heapq.heapify(ready)
+
+    start_day = [0] * count
+    position = {}  # work_center -> (day, hours used that day)
+    while ready:
+        earliest, _, _, i = heapq.heappop(ready)
+        work_center, planned, actual = operations[i][3:6]
+        daily = capacity.get(work_center, default_capacity)
+
+        day, used = position.get(work_center, (0, 0.0))
+        if day < earliest:
+            day, used = earliest, 0.0
+        if used >= daily:
+            day, used = day + 1, 0.0
+
+        hours = max((planned or 0.0) - (actual or 0.0), 0.0)
+        start_day[i] = day
+        finish_day, used = _finish(day, used, hours, daily)
+        position[work_center] = (finish_day, used)
+
+        if successor[i] >= 0:
+            nxt = operations[successor[i]]
+            heapq.heappush(ready, (finish_day, nxt[1], nxt[2], successor[i]))
+
+    return start_day, {wc: day for wc, (day, _) in position.items()}
+
+
+def _to_dates(offsets, start, skip_weekends):
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if skip_weekends:
+        return np.busday_offset(np.datetime64(start, 'D'), offsets, roll='forward').astype(object)
+    return (np.datetime64(start, 'D') + offsets).astype(object)
+
+
+def auto_schedule(start=None, capacity=None, default_capacity=None, dry_run=False, skip_weekends=None):
+    """Schedule every open operation for the whole shop in one run.
+
+    Unless ``dry_run`` is set, changed dates are written back with a single
+    bulk UPDATE in one transaction.
+    """
+    start = start or date.today()
+    if default_capacity is None:
+        default_capacity = app.config.get('SCHEDULER_DAILY_CAPACITY', 8.0)
+    if skip_weekends is None:
+        skip_weekends = app.config.get('SCHEDULER_SKIP_WEEKENDS', True)
+    capacity = {**app.config.get('WORK_CENTER_CAPACITY', {}), **(capacity or {})}
+    if default_capacity <= 0 or any(hours <= 0 for hours in capacity.values()):
+        raise ValueError("Daily capacity must be positive")
+
+    operations = load_open_operations()
+    offsets, finish = build_schedule(operations, capacity, default_capacity)
+    dates = _to_dates(offsets, start, skip_weekends) if operations else []
+    finish_dates = dict(zip(finish, _to_dates(list(finish.values()), start, skip_weekends))) if finish else {}
+
+    version = current_schedule_version() + 1
+    changes = [{'id': op[0], 'scheduled_date': new_date, 'schedule_version': version}
+               for op, new_date in zip(operations, dates) if op[6] != new_date]
+
+    result = {
+        'dry_run': dry_run,
+        'operations': len(operations),
+        'changed': len(changes),
+        'start': start.isoformat(),
+        'end': max(finish_dates.values()).isoformat() if finish_dates else None,
+        'work_centers': {wc: {'finish': day.isoformat(), 'daily_capacity': capacity.get(wc, default_capacity)}
+                         for wc, day in finish_dates.items()},
+    }
+
+    if dry_run:
+        result['assignments'] = [{'operation_id': op[0], 'date': new_date.isoformat()}
+                                 for op, new_date in zip(operations, dates)]
+        return result
+
+    if changes:
+        db.session.execute(update(Operation), changes)
+        apply_deltas(_scheduled_count_deltas((op[3], op[6], new_date) for op, new_date in zip(operations, dates)
+                                             if op[6] != new_date))
+        db.session.commit()
+        bump_data_version()
+        schedule_refresh()
+        _publish_schedule(version, [(change['id'], change['scheduled_date']) for change in changes])
+    logger.info(f"📅 Scheduled {len(operations)} operations, {len(changes)} dates changed")
+    return result
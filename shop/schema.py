@@ -0,0 +1,138 @@
+from app import app, db
+from models import Operation, WorkOrder, SchemaMigration
+from sqlalchemy import delete, func, inspect, select, text
+import click
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _column_names(table):
+    return {column['name'] for column in inspect(db.session.connection()).get_columns(table.name)}
+
+
+def _add_column(column):
+    """ALTER TABLE ... ADD COLUMN for a model column the table does not have yet"""
+    table = column.table
+    if column.name in _column_names(table):
+        return
+    dialect = db.session.get_bind().dialect
+    column_type = column.type.compile(dialect=dialect)
+    db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    if column.default is not None and column.default.is_scalar:
+        db.session.execute(table.update().values({column.name: column.default.arg}))
+
+
+def _create_indexes(table):
+    """Create the model's indexes that the table does not have yet"""
+    inspector = inspect(db.session.connection())
+    existing = {index['name'] for index in inspector.get_indexes(table.name)}
+    existing |= {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(db.session.connection())
+            logger.info(f"🗂️ Created index {index.name}")
+
+
+def _operation_columns():
+    _add_column(Operation.__table__.c.row_hash)
+    _add_column(Operation.__table__.c.schedule_version)
+
+
+def _hot_path_indexes():
+    _create_indexes(Operation.__table__)
+    _create_indexes(WorkOrder.__table__)
+
+
+def _operation_unique_key():
+    """Unique (work_order_id, operation_number), keeping the newest row of any duplicates"""
+    inspector = inspect(db.session.connection())
+    names = {constraint['name'] for constraint in inspector.get_unique_constraints('operation')}
+    names |= {index['name'] for index in inspector.get_indexes('operation')}
+    if 'uq_operation_work_order_op' in names:
+        return
+
+    newest = (select(func.max(Operation.id))
+              .group_by(Operation.work_order_id, Operation.operation_number)
+              .scalar_subquery())
+    removed = db.session.execute(delete(Operation).where(Operation.id.not_in(newest))).rowcount
+    if removed:
+        logger.warning(f"⚠️ Removed {removed} duplicate operations before adding the unique key")
+    db.session.execute(text('CREATE UNIQUE INDEX uq_operation_work_order_op '
+                            'ON operation (work_order_id, operation_number)'))
+
+
+def _operation_history_view():
+    """The operation_history view over hot and archived operations, for reports and ad hoc SQL"""
+    if 'operation_history' in inspect(db.session.connection()).get_view_names():
+        return
+    from archive import history_query
+    dialect = db.session.get_bind().dialect
+    sql = history_query().compile(dialect=dialect, compile_kwargs={'literal_binds': True})
+    db.session.execute(text(f'CREATE VIEW operation_history AS {sql}'))
+
+
+def _work_center_summary():
+    """Build the WorkCenterSummary rollup from the stored operations; imports and schedule changes keep it current"""
+    from rollup import write_work_center_summary
+    count = write_work_center_summary()
+    logger.info(f"📊 Built the work center summary for {count} work centers")
+
+
+# Applied in order and recorded in SchemaMigration. Each step checks the live
+# schema first, so databases built by db.create_all() just get them recorded.
+MIGRATIONS = [
+    ('0001_operation_columns', _operation_columns),
+    ('0002_hot_path_indexes', _hot_path_indexes),
+    ('0003_operation_unique_key', _operation_unique_key),
+    ('0004_operation_history_view', _operation_history_view),
+    ('0005_work_center_summary', _work_center_summary),
+]
+
+
+def drop_schema():
+    """Drop every table, for scratch databases: the operation_history view first, as it depends on them.
+
+    The data version starts over with the tables, so this process's cached
+    responses are dropped too.
+    """
+    from cache import get_cache_backend
+    db.session.remove()
+    db.session.execute(text('DROP VIEW IF EXISTS operation_history'))
+    db.session.commit()
+    db.drop_all()
+    get_cache_backend().clear()
+
+
+def pending_migrations():
+    """Names of the migrations not yet applied to this database"""
+    applied = set(db.session.execute(select(SchemaMigration.name)).scalars())
+    return [name for name, _ in MIGRATIONS if name not in applied]
+
+
+def upgrade_schema():
+    """Create missing tables, then apply pending migrations, each in its own transaction.
+
+    Returns the names of the migrations applied.
+    """
+    db.create_all()
+    pending = pending_migrations()
+    steps = dict(MIGRATIONS)
+    for name in pending:
+        try:
+            steps[name]()
+            db.session.add(SchemaMigration(name=name))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Migration {name} failed: {str(e)}")
+            raise
+        logger.info(f"✅ Applied migration {name}")
+    return pending
+
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create the tables, or bring an existing database's columns and indexes up to date."""
+    applied = upgrade_schema()
+    click.echo(f"Applied {len(applied)} migrations" + (f": {', '.join(applied)}" if applied else ""))
@@ -0,0 +1,178 @@
+from app import app
+from flask import Response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from datetime import date
+import logging
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are only gzip-compressed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STREAM_BATCH_ROWS = 500  # Rows serialized into each chunk of a streamed response
+BROTLI_QUALITY = 4  # Brotli's fast levels suit responses compressed on every request
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/html', 'text/plain', 'text/css',
+                          'text/javascript', 'application/javascript'}
+
+
+def _iso(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Compact JSON bytes for API payloads; dates and datetimes become ISO 8601 strings"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_iso, separators=(',', ':')).encode()
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """``app.json`` backed by orjson; ``jsonify`` output parses the same as with Flask's provider.
+
+    Dates still go through Flask's default hook, so they keep the HTTP date
+    format ``jsonify`` always used.
+    """
+
+    def _encode(self, obj, sort_keys=True, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) - {'sort_keys', 'indent', 'separators', 'ensure_ascii'}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, kwargs.get('sort_keys', self.sort_keys), bool(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, self.sort_keys, indent) + b'\n', mimetype=self.mimetype)
+
+
+def wants_columns():
+    """True when the client asked for the columnar format with ``?format=columns``"""
+    return request.args.get('format') == 'columns'
+
+
+def to_columns(rows, fields):
+    """Transpose row tuples into ``{field: [value, ...]}``, one array per field"""
+    rows = list(rows)
+    columns = zip(*rows) if rows else [()] * len(fields)
+    return {field: list(values) for field, values in zip(fields, columns)}
+
+
+def columns_response(rows, fields):
+    """JSON response in the compact columnar format: one array per field rather than an object per row"""
+    return Response(dumps(to_columns(rows, fields)), mimetype='application/json')
+
+
+def _json_array(items):
+    yield b'['
+    batch = []
+    first = True
+    for item in items:
+        batch.append(dumps(item))
+        if len(batch) >= STREAM_BATCH_ROWS:
+            yield (b'' if first else b',') + b','.join(batch)
+            batch = []
+            first = False
+    if batch:
+        yield (b'' if first else b',') + b','.join(batch)
+    yield b']'
+
+
+def stream_json_array(items):
+    """Chunked response writing ``items`` as one JSON array while they are produced.
+
+    Feed it rows read through a server-side cursor (``yield_per``) and the
+    first bytes leave before the query has finished, with only one batch of
+    rows held at a time. The request context stays open until the body has
+    been sent, so the generator can keep using ``db.session``.
+    """
+    return Response(stream_with_context(_json_array(items)), mimetype='application/json')
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    """(compress, flush, finish) functions of a fresh compressor for ``encoding``"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(app.config.get('COMPRESSION_LEVEL', 6), zlib.DEFLATED, 31)  # 31: gzip container
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    compress, flush, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            # Flushing per chunk keeps a streamed response streaming rather than buffered in the compressor
+            yield data + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+@app.after_request
+def _compress_response(response):
+    """gzip or Brotli JSON, CSV and text responses when the client accepts it.
+
+    Streamed responses are compressed chunk by chunk as they are sent; other
+    responses only above COMPRESSION_MIN_SIZE bytes. ETags become weak, since
+    the encoded bytes differ from the cached body they were computed from.
+    """
+    if (not app.config.get('COMPRESSION_ENABLED', True) or response.status_code != 200
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+    else:
+        body = response.get_data()
+        if len(body) < app.config.get('COMPRESSION_MIN_SIZE', 1024):
+            return response
+        compress, _, finish = _compressor(encoding)
+        response.set_data(compress(body) + finish())
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+if orjson is not None and app.config.get('FAST_JSON_ENABLED', True):
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,260 @@
+from app import app, db
+from models import Operation
+from cache import data_version
+from sqlalchemy import select
+from datetime import datetime
+import threading
+import click
+import shutil
+import json
+import uuid
+import logging
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshot rebuilds are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOTS_KEPT = 3  # Older snapshot directories are deleted; readers still mapping them keep their pages
+
+# Column name -> dtype of the .npy file. work_center and status are stored as
+# codes into the lists saved in meta.json (-1 for a missing status). NumPy and
+# pandas are imported inside the functions that use them, as this module is
+# loaded at startup to register its CLI command.
+SNAPSHOT_COLUMNS = {
+    'id': 'int64',
+    'work_order_id': 'int64',
+    'operation_number': 'int64',
+    'work_center': 'int32',
+    'status': 'int16',
+    'planned_hours': 'float64',
+    'actual_hours': 'float64',
+    'scheduled_date': 'datetime64[D]',
+    'completed_at': 'datetime64[us]',
+}
+
+_lock = threading.Lock()
+_loaded = None  # (snapshot name, snapshot) of the one this process has mapped
+_pending_lock = threading.Lock()
+_pending = None  # Timer of this process's scheduled background rebuild
+
+
+def _folder():
+    return app.config.get('SNAPSHOT_FOLDER')
+
+
+def _current_path():
+    return os.path.join(_folder(), 'CURRENT')
+
+
+class _RebuildLock:
+    """Serialize rebuilds across threads and, where fcntl exists, across worker processes"""
+
+    def __enter__(self):
+        _lock.acquire()
+        self._file = None
+        if fcntl is not None:
+            self._file = open(os.path.join(_folder(), '.lock'), 'w')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+        _lock.release()
+
+
+def _read_columns():
+    """All operations as typed NumPy columns, read in one query"""
+    import numpy as np
+    import pandas as pd
+    # Read first: the rows read next hold every change committed before this version
+    version = data_version()
+    frame = pd.DataFrame(db.session.execute(
+        select(Operation.id, Operation.work_order_id, Operation.operation_number, Operation.work_center,
+               Operation.status, Operation.planned_hours, Operation.actual_hours,
+               Operation.scheduled_date, Operation.completed_at)
+        .order_by(Operation.id)).all(), columns=list(SNAPSHOT_COLUMNS))
+
+    work_centers = pd.Categorical(frame['work_center'])
+    statuses = pd.Categorical(frame['status'])
+    columns = {
+        'id': frame['id'].to_numpy(dtype=np.int64),
+        'work_order_id': frame['work_order_id'].to_numpy(dtype=np.int64),
+        'operation_number': frame['operation_number'].to_numpy(dtype=np.int64),
+        'work_center': work_centers.codes.astype(np.int32),
+        'status': statuses.codes.astype(np.int16),
+        'planned_hours': frame['planned_hours'].astype(float).fillna(0.0).to_numpy(),
+        'actual_hours': frame['actual_hours'].astype(float).fillna(0.0).to_numpy(),
+        'scheduled_date': pd.to_datetime(frame['scheduled_date']).to_numpy(dtype='datetime64[D]'),
+        'completed_at': pd.to_datetime(frame['completed_at']).to_numpy(dtype='datetime64[us]'),
+    }
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'data_version': version,
+        'rows': len(frame),
+        'work_centers': [str(wc) for wc in work_centers.categories],
+        'statuses': [str(status) for status in statuses.categories],
+        'created_at': datetime.utcnow().isoformat(),
+    }
+    return columns, meta
+
+
+def refresh_snapshot():
+    """Regenerate the operations snapshot from the database and publish it to every worker.
+
+    Call after committing changes to operations. Each rebuild reads the
+    database only once it holds the rebuild lock, so the last one published
+    includes every change committed before it started.
+    """
+    if not app.config.get('SNAPSHOT_ENABLED', True):
+        return None
+    os.makedirs(_folder(), exist_ok=True)
+    with _RebuildLock():
+        try:
+            name, rows = _write_snapshot()
+        except Exception as e:
+            # Better to fall back to the database than to serve stale data
+            logger.error(f"❌ Could not write operations snapshot: {str(e)}")
+            if os.path.exists(_current_path()):
+                os.remove(_current_path())
+            return None
+
+    logger.info(f"📸 Wrote operations snapshot {name} ({rows} rows)")
+    return name
+
+
+def schedule_refresh():
+    """Rebuild the snapshot in the background, SNAPSHOT_REFRESH_DELAY seconds from the first call.
+
+    For small edits such as schedule changes, which would otherwise pay for a
+    full rebuild each. Calls made while a rebuild is pending share it. Call
+    after ``bump_data_version()``: until the rebuild is published, readers
+    see the snapshot is behind the data version and use the database.
+    """
+    global _pending
+    if not app.config.get('SNAPSHOT_ENABLED', True):
+        return
+    with _pending_lock:
+        if _pending is not None:
+            return
+        _pending = threading.Timer(app.config.get('SNAPSHOT_REFRESH_DELAY', 2), _background_refresh)
+        _pending.daemon = True
+        _pending.start()
+
+
+def _background_refresh():
+    global _pending
+    with _pending_lock:
+        _pending = None  # Changes committed from now on schedule another rebuild
+    with app.app_context():
+        refresh_snapshot()
+
+
+def _write_snapshot():
+    import numpy as np
+    columns, meta = _read_columns()
+    name = f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(_folder(), name)
+    os.makedirs(directory)
+    for column, values in columns.items():
+        np.save(os.path.join(directory, f'{column}.npy'), values.astype(SNAPSHOT_COLUMNS[column], copy=False))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Readers pick the new snapshot up from CURRENT; the swap is atomic
+    pointer = f"{_current_path()}.{name}"
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, _current_path())
+    _prune(keep=name)
+    return name, meta['rows']
+
+
+def _prune(keep):
+    names = sorted(n for n in os.listdir(_folder()) if os.path.isdir(os.path.join(_folder(), n)))
+    for name in names[:-SNAPSHOTS_KEPT]:
+        if name != keep:
+            shutil.rmtree(os.path.join(_folder(), name), ignore_errors=True)
+
+
+def load_snapshot():
+    """The current snapshot as read-only memory-mapped arrays, or None if snapshots are unavailable or stale.
+
+    Arrays are mapped rather than read, so every worker process shares the
+    same page-cache copy. A process remaps only when CURRENT changes. The
+    first snapshot is written on demand; one built at another data version
+    (older, or from before the tables were recreated) is not used, and a
+    rebuild is scheduled in case none is pending.
+    """
+    global _loaded
+    if not app.config.get('SNAPSHOT_ENABLED', True):
+        return None
+    if not os.path.exists(_current_path()) and refresh_snapshot() is None:
+        return None
+    try:
+        with open(_current_path()) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+
+    with _lock:
+        if not (_loaded and _loaded[0] == name):
+            _loaded = _map(name)
+        snapshot = _loaded and _loaded[1]
+    if snapshot is not None and snapshot['meta'].get('data_version') != data_version():
+        schedule_refresh()
+        return None
+    return snapshot
+
+
+def _map(name):
+    """``(name, snapshot)`` with the arrays of snapshot ``name`` mapped, or None"""
+    import numpy as np
+    directory = os.path.join(_folder(), name)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != SNAPSHOT_FORMAT:
+            return None
+        arrays = {column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')
+                  for column in SNAPSHOT_COLUMNS}
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Could not map snapshot {name}: {str(e)}")
+        return None
+    return name, {'name': name, 'meta': meta, 'columns': arrays}
+
+
+def snapshot_frame(snapshot, work_center=None):
+    """Operations from ``snapshot`` in the frame layout used by ``forecasting.operations_frame``"""
+    import numpy as np
+    import pandas as pd
+    columns = snapshot['columns']
+    meta = snapshot['meta']
+    rows = slice(None)
+    if work_center is not None:
+        if work_center not in meta['work_centers']:
+            rows = np.zeros(meta['rows'], dtype=bool)
+        else:
+            rows = columns['work_center'] == meta['work_centers'].index(work_center)
+
+    return pd.DataFrame({
+        'work_center': pd.Categorical.from_codes(columns['work_center'][rows], meta['work_centers']),
+        'status': pd.Categorical.from_codes(columns['status'][rows], meta['statuses']),
+        'planned_hours': columns['planned_hours'][rows],
+        'actual_hours': columns['actual_hours'][rows],
+        'scheduled_date': pd.to_datetime(columns['scheduled_date'][rows]),
+        'completed_at': pd.to_datetime(columns['completed_at'][rows]),
+    })
+
+
+@app.cli.command('refresh-snapshot')
+def refresh_snapshot_command():
+    """Regenerate the columnar operations snapshot."""
+    name = refresh_snapshot()
+    click.echo(f"Wrote snapshot {name}" if name else "Snapshots are disabled")
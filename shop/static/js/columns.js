@@ -0,0 +1,50 @@
+// Helpers for API responses requested with ?format=columns, which send one
+// array per field ({field: [values...]}) instead of an array of objects.
+function rowsFromColumns(columns) {
+    const fields = Object.keys(columns);
+    const count = fields.length ? columns[fields[0]].length : 0;
+    const rows = new Array(count);
+    for (let i = 0; i < count; i++) {
+        const row = {};
+        fields.forEach(field => { row[field] = columns[field][i]; });
+        rows[i] = row;
+    }
+    return rows;
+}
+
+// Rebuild the nested /api/jobs shape from its flat operation rows. Rows arrive
+// grouped by job and work order; a job's summary comes from its first operation.
+function jobsFromColumns(columns) {
+    const jobs = [];
+    let job = null;
+    let workOrder = null;
+    rowsFromColumns(columns).forEach(row => {
+        if (!job || job.job_number !== row.job_number) {
+            job = {
+                job_number: row.job_number,
+                status: row.operation_number === null ? 'Unknown' : row.status,
+                start_date: row.scheduled_date,
+                due_date: row.completed_at,
+                work_orders: []
+            };
+            jobs.push(job);
+            workOrder = null;
+        }
+        if (row.work_order_number === null) return;
+        if (!workOrder || workOrder.work_order_number !== row.work_order_number) {
+            workOrder = { work_order_number: row.work_order_number, operations: [] };
+            job.work_orders.push(workOrder);
+        }
+        if (row.operation_number === null) return;
+        workOrder.operations.push({
+            operation_number: row.operation_number,
+            work_center: row.work_center,
+            planned_hours: row.planned_hours,
+            actual_hours: row.actual_hours,
+            status: row.status,
+            scheduled_date: row.scheduled_date,
+            completed_at: row.completed_at
+        });
+    });
+    return jobs;
+}
@@ -1,6 +1,8 @@
 document.addEventListener('DOMContentLoaded', function() {
     let workCenterChart = null;
     let isLoading = false; // Prevent multiple requests
+    let workCenters = {};
+    let jobs = [];
 
     // File upload handling
     const uploadForm = document.getElementById('uploadForm');
@@ -16,7 +18,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 return;
             }
 
-            formData.append('file', fileInput.files[0]);
+            // Several files, or a .zip, are imported together as one batch
+            Array.from(fileInput.files).forEach(file => formData.append('file', file));
 
             // Show loading indicator
             document.getElementById('uploadStatus').style.display = 'block';
@@ -28,25 +31,94 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(response => response.json())
             .then(data => {
-                document.getElementById('uploadStatus').style.display = 'none';
-                document.getElementById('uploadButton').disabled = false;
-
-                if (data.status === "success") {
-                    alert('✅ File uploaded and processed successfully!');
-                    loadDashboardData(); // Refresh dashboard data after successful upload
+                if (data.status === "queued") {
+                    pollImport(data.import_id);
                 } else {
+                    finishUpload();
                     alert('❌ Error: ' + (data.error || 'Upload failed'));
                 }
             })
             .catch(error => {
-                document.getElementById('uploadStatus').style.display = 'none';
-                document.getElementById('uploadButton').disabled = false;
+                finishUpload();
                 console.error('❌ Upload Error:', error);
                 alert('❌ Upload failed: ' + error.message);
             });
         });
     }
 
+    // Instant analysis of the chosen file, before anything is imported
+    const sapdataInput = document.getElementById('sapdata');
+    if (sapdataInput) {
+        sapdataInput.addEventListener('change', function() {
+            const preview = document.getElementById('uploadPreview');
+            if (!sapdataInput.files.length || !preview) return;
+            const first = sapdataInput.files[0];
+            if (sapdataInput.files.length > 1 || first.name.toLowerCase().endsWith('.zip')) {
+                preview.textContent = `Batch import: every sheet of ${sapdataInput.files.length > 1 ?
+                    sapdataInput.files.length + ' files' : first.name} will be imported together`;
+                return;
+            }
+
+            const formData = new FormData();
+            formData.append('file', sapdataInput.files[0]);
+            preview.textContent = 'Analysing file...';
+
+            fetch('/api/preview?jobs=0', {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    preview.textContent = '❌ ' + data.error;
+                    return;
+                }
+                const critical = data.work_centers.filter(wc => wc.urgency === 'Critical').length;
+                preview.textContent = `${data.rows} operations in ${data.orders} orders across ` +
+                    `${data.work_centers.length} work centers (${critical} critical)`;
+            })
+            .catch(error => {
+                console.error('❌ Preview Error:', error);
+                preview.textContent = 'Preview unavailable';
+            });
+        });
+    }
+
+    function finishUpload() {
+        document.getElementById('uploadStatus').style.display = 'none';
+        document.getElementById('uploadProgress').textContent = 'Processing...';
+        document.getElementById('uploadButton').disabled = false;
+    }
+
+    // Poll the background import until it finishes
+    function pollImport(importId) {
+        fetch(`/api/imports/${importId}`)
+            .then(response => response.json())
+            .then(data => {
+                const progressText = document.getElementById('uploadProgress');
+                if (data.status === 'queued' || data.status === 'running') {
+                    const total = data.rows_total ? ` of ${data.rows_total}` : '';
+                    const eta = data.eta_seconds !== null ? ` (about ${Math.ceil(data.eta_seconds)}s left)` : '';
+                    progressText.textContent = `Importing... ${data.rows_processed}${total} rows${eta}`;
+                    setTimeout(() => pollImport(importId), 1000);
+                    return;
+                }
+
+                finishUpload();
+                if (data.status === 'completed') {
+                    alert(`✅ File processed: ${data.inserted} inserted, ${data.updated} updated, ${data.rows_rejected} rejected`);
+                    loadDashboardData(); // Refresh dashboard data after successful upload
+                } else {
+                    alert('❌ Error: ' + (data.error || 'Import failed'));
+                }
+            })
+            .catch(error => {
+                finishUpload();
+                console.error('❌ Import Status Error:', error);
+                alert('❌ Could not check import status: ' + error.message);
+            });
+    }
+
     function loadDashboardData() {
         if (isLoading) return; // Prevent duplicate calls
         isLoading = true;
@@ -55,11 +127,13 @@ document.addEventListener('DOMContentLoaded', function() {
 
         Promise.all([
             fetch('/api/work_centers').then(res => res.json()),
-            fetch('/api/jobs').then(res => res.json())
+            fetch('/api/jobs?format=columns').then(res => res.json()).then(jobsFromColumns)
         ])
         .then(([workCenterData, jobsData]) => {
             console.log("🚀 Received work centers:", Object.keys(workCenterData).length);
             console.log("🚀 Received jobs:", jobsData.length);
+            workCenters = workCenterData;
+            jobs = jobsData;
 
             updateWorkCenterChart(workCenterData);
             updateEfficiencyMetrics(workCenterData);
@@ -70,7 +144,6 @@ document.addEventListener('DOMContentLoaded', function() {
         .finally(() => {
             document.getElementById('uploadStatus').style.display = 'none';
             isLoading = false; // Allow next request
-            setTimeout(loadDashboardData, 300000); // Wait 5 minutes before calling again
         })
         .catch(error => {
             console.error('❌ Error loading dashboard data:', error);
@@ -229,5 +302,19 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Schedule changes only move work-center rollups; imports also change the job list
+    function applyWorkCenterRollups(event) {
+        mergeRollups(workCenters, event.rollups, 'work_center');
+        updateWorkCenterChart(workCenters);
+        updateEfficiencyMetrics(workCenters);
+        updateStatusCards(jobs, workCenters);
+    }
+
+    subscribeChanges({
+        import: loadDashboardData,
+        schedule: applyWorkCenterRollups,
+        reload: loadDashboardData
+    });
+
     loadDashboardData();
 });
@@ -2,10 +2,13 @@ document.addEventListener('DOMContentLoaded', function() {
     let forecastChart = null;
     const forecastCtx = document.getElementById('forecastChart').getContext('2d');
 
+    let forecastData = {};
+
     function loadForecastData() {
         fetch('/api/forecast')
             .then(response => response.json())
             .then(data => {
+                forecastData = data;
                 updateForecastChart(data);
                 updateForecastTable(data);
             })
@@ -147,6 +150,16 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initial load
     loadForecastData();
 
-    // Set up automatic refresh every 5 minutes
-    setInterval(loadForecastData, 300000);
+    // Redraw from the rollups pushed with each change instead of polling
+    function applyRollups(event) {
+        mergeRollups(forecastData, event.rollups, 'forecast');
+        updateForecastChart(forecastData);
+        updateForecastTable(forecastData);
+    }
+
+    subscribeChanges({
+        import: applyRollups,
+        schedule: applyRollups,
+        reload: loadForecastData
+    });
 });
@@ -0,0 +1,25 @@
+// Live change events pushed by /api/stream (Server-Sent Events).
+// Pages pass handlers keyed by event type: "import", "schedule" and "reload"
+// (sent when events were missed and the page should fetch everything again).
+function subscribeChanges(handlers) {
+    if (!window.EventSource) return null;
+
+    const source = new EventSource('/api/stream');
+    Object.entries(handlers).forEach(([kind, handler]) => {
+        source.addEventListener(kind, event => handler(JSON.parse(event.data)));
+    });
+    return source;
+}
+
+// Merge an event's rollups into a {workCenter: row} map; field picks the row shape
+// ("forecast" or "work_center"). Work centers sent as null are removed.
+function mergeRollups(data, rollups, field) {
+    Object.entries(rollups || {}).forEach(([workCenter, rows]) => {
+        if (rows === null) {
+            delete data[workCenter];
+        } else {
+            data[workCenter] = rows[field];
+        }
+    });
+    return data;
+}
@@ -1,14 +1,27 @@
 
+let nextCursor = null; // X-Next-Cursor of the last page loaded
+
 document.addEventListener('DOMContentLoaded', function() {
-    // Fetch purchase data
-    fetch('/api/purchase')
-        .then(response => response.json())
+    loadPurchaseOrders();
+    document.getElementById('loadMorePOs').addEventListener('click', () => loadPurchaseOrders(nextCursor));
+});
+
+// Fetch purchase data; the first page also carries metrics and the timeline
+function loadPurchaseOrders(after) {
+    fetch(after ? `/api/purchase?after=${after}` : '/api/purchase')
+        .then(response => {
+            nextCursor = response.headers.get('X-Next-Cursor');
+            return response.json();
+        })
         .then(data => {
-            updateDashboardMetrics(data);
-            createCharts(data);
-            populateTable(data.purchase_orders);
+            if (!after) {
+                updateDashboardMetrics(data);
+                createCharts(data);
+            }
+            populateTable(data.purchase_orders, Boolean(after));
+            document.getElementById('loadMorePOs').style.display = nextCursor ? 'inline-block' : 'none';
         });
-});
+}
 
 function updateDashboardMetrics(data) {
     document.getElementById('openPOCount').textContent = data.metrics.open_pos;
@@ -58,15 +71,17 @@ function createCharts(data) {
     });
 }
 
-function populateTable(purchaseOrders) {
+function populateTable(purchaseOrders, append) {
     const tableBody = document.getElementById('purchaseOrdersTable');
-    tableBody.innerHTML = '';
-    
+    if (!append) {
+        tableBody.innerHTML = '';
+    }
+
     purchaseOrders.forEach(po => {
         const row = document.createElement('tr');
         row.innerHTML = `
             <td>${po.po_number}</td>
-            <td>${po.material}</td>
+            <td>${po.material || ''}</td>
             <td>${po.quantity}</td>
             <td>${po.delivery_date}</td>
             <td><span class="badge bg-${getStatusBadgeColor(po.status)}">${po.status}</span></td>
@@ -1,6 +1,7 @@
 
 document.addEventListener('DOMContentLoaded', function() {
     let calendar;
+    let scheduleVersion = null; // Latest X-Schedule-Version seen
     const calendarEl = document.getElementById('calendar');
 
     // Initialize FullCalendar
@@ -24,11 +25,61 @@ document.addEventListener('DOMContentLoaded', function() {
             const jobId = info.draggedEl.dataset.jobId;
             showJobModal(null, info.date, jobId);
         },
-        events: '/api/schedule'
+        events: function(info, successCallback, failureCallback) {
+            // Only the visible range is fetched; remember the version for incremental refreshes
+            const params = new URLSearchParams({ start: info.startStr, end: info.endStr, format: 'columns' });
+            fetch(`/api/schedule?${params}`)
+                .then(response => {
+                    scheduleVersion = response.headers.get('X-Schedule-Version');
+                    return response.json();
+                })
+                .then(eventsFromColumns)
+                .then(successCallback)
+                .catch(failureCallback);
+        }
     });
 
     calendar.render();
 
+    // Calendar events from /api/schedule?format=columns
+    function eventsFromColumns(columns) {
+        return rowsFromColumns(columns).map(row => ({
+            id: row.id,
+            title: `${row.work_order_number} - Op ${row.operation_number}`,
+            start: row.start,
+            work_center: row.work_center
+        }));
+    }
+
+    // Pull only the operations rescheduled since the last fetch
+    function refreshScheduleChanges() {
+        if (scheduleVersion === null) return;
+        const view = calendar.view;
+        const params = new URLSearchParams({
+            start: view.activeStart.toISOString(),
+            end: view.activeEnd.toISOString(),
+            since: scheduleVersion,
+            format: 'columns'
+        });
+        fetch(`/api/schedule?${params}`)
+            .then(response => {
+                scheduleVersion = response.headers.get('X-Schedule-Version');
+                return response.json();
+            })
+            .then(eventsFromColumns)
+            .then(events => {
+                events.forEach(eventData => {
+                    const existing = calendar.getEventById(String(eventData.id));
+                    if (existing) {
+                        existing.setStart(eventData.start);
+                    } else {
+                        calendar.addEvent(eventData);
+                    }
+                });
+            })
+            .catch(error => console.error('Error refreshing schedule:', error));
+    }
+
     // Load unscheduled jobs
     function loadUnscheduledJobs() {
         fetch('/api/jobs')
@@ -95,17 +146,46 @@ document.addEventListener('DOMContentLoaded', function() {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                id: event.id,
-                start: event.start,
-                end: event.end || event.start,
-                title: event.title,
-                extendedProps: event.extendedProps
+                changes: [{
+                    operation_id: event.id,
+                    date: event.startStr.split('T')[0]
+                }]
             })
         });
     }
 
+    // Move events as changes are pushed; fall back to a ?since= fetch when the
+    // event has no change list or an earlier version was missed
+    function applyScheduleEvent(event) {
+        if (!event.changes || scheduleVersion === null || String(event.previous_version) !== scheduleVersion) {
+            refreshScheduleChanges();
+            return;
+        }
+        let needsFetch = false;
+        event.changes.forEach(change => {
+            const existing = calendar.getEventById(String(change.id));
+            if (existing && change.start) {
+                existing.setStart(change.start);
+            } else if (existing) {
+                existing.remove();
+            } else if (change.start) {
+                needsFetch = true; // Not on the calendar yet, so its title is unknown here
+            }
+        });
+        if (needsFetch) {
+            refreshScheduleChanges();
+        } else {
+            scheduleVersion = String(event.version);
+        }
+    }
+
     // Initial load
     loadUnscheduledJobs();
+    subscribeChanges({
+        schedule: applyScheduleEvent,
+        import: () => calendar.refetchEvents(),
+        reload: () => calendar.refetchEvents()
+    });
 
     // Save schedule button handler
     document.getElementById('saveSchedule').addEventListener('click', function() {
@@ -1,17 +1,40 @@
 document.addEventListener('DOMContentLoaded', function() {
+    let workCenterData = {};
+    let statusChart = null;
+    let efficiencyChart = null;
+
     // Fetch work center data
-    fetch('/api/work_centers')
-        .then(response => response.json())
-        .then(data => {
-            updateWorkCenterTable(data);
-            createStatusChart(data);
-            createEfficiencyChart(data);
-        });
+    function loadWorkCenters() {
+        fetch('/api/work_centers')
+            .then(response => response.json())
+            .then(data => {
+                workCenterData = data;
+                renderWorkCenters(data);
+            });
+    }
+
+    function renderWorkCenters(data) {
+        updateWorkCenterTable(data);
+        createStatusChart(data);
+        createEfficiencyChart(data);
+    }
+
+    loadWorkCenters();
+
+    // Apply the rollups pushed with each change
+    subscribeChanges({
+        import: event => renderWorkCenters(mergeRollups(workCenterData, event.rollups, 'work_center')),
+        schedule: event => renderWorkCenters(mergeRollups(workCenterData, event.rollups, 'work_center')),
+        reload: loadWorkCenters
+    });
 
     // Work Center Status Chart
     function createStatusChart(data) {
         const ctx = document.getElementById('workCenterStatus').getContext('2d');
-        new Chart(ctx, {
+        if (statusChart) {
+            statusChart.destroy();
+        }
+        statusChart = new Chart(ctx, {
             type: 'bar',
             data: {
                 labels: Object.keys(data),
@@ -39,7 +62,10 @@ document.addEventListener('DOMContentLoaded', function() {
     // Efficiency Chart
     function createEfficiencyChart(data) {
         const ctx = document.getElementById('efficiencyChart').getContext('2d');
-        new Chart(ctx, {
+        if (efficiencyChart) {
+            efficiencyChart.destroy();
+        }
+        efficiencyChart = new Chart(ctx, {
             type: 'line',
             data: {
                 labels: Object.keys(data),
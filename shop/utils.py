@@ -1,133 +1,148 @@
-from app import db
-from models import Job, WorkOrder, Operation
-from datetime import datetime, timedelta
-import pandas as pd
+from app import app, db
+from models import ImportRun
+from sqlalchemy import update
+import hashlib
 import logging
 
-def process_sapdata(df):
+# importer, excel_reader and forecasting load pandas, so they are imported where
+# used; the rollup row helpers at the bottom are needed by every worker at startup.
+
+def process_sapdata(df, chunk_size=None):
     """Process uploaded SAPDATA Excel file and update database"""
+    from importer import import_frame
+    try:
+        return import_frame(df, chunk_size=chunk_size)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"❌ Fatal Error Processing SAPDATA: {str(e)}")
+        raise
+
+def file_hash(source):
+    """SHA-256 of a binary file object, read in blocks; the file is rewound afterwards"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+def _previous_import(digest, label):
+    """Result to report when ``digest`` matches the previous import, which is then skipped; None otherwise"""
+    last_run = ImportRun.query.filter(ImportRun.file_hash.isnot(None)).order_by(ImportRun.id.desc()).first()
+    if not last_run or last_run.file_hash != digest:
+        return None
+    logging.info(f"⏭️ {label} matches the previous import, skipping")
+    return {'rows': last_run.rows, 'inserted': 0, 'updated': 0,
+            'unchanged': last_run.inserted + last_run.updated + last_run.unchanged,
+            'removed': 0, 'purchase_orders': 0, 'rejected': [], 'skipped': True}
+
+def _record_import(filename, digest, result, import_id=None):
+    """Store a finished import's hash and counts, on its queued ImportRun row when it has one"""
+    result.setdefault('skipped', False)
+    fields = {
+        'file_hash': digest,
+        'rows': result['rows'],
+        'inserted': result['inserted'],
+        'updated': result['updated'],
+        'unchanged': result['unchanged'],
+        'removed': result['removed'],
+        'rejected': len(result['rejected']),
+    }
+    if import_id:
+        db.session.execute(update(ImportRun).where(ImportRun.import_id == import_id).values(**fields))
+    else:
+        db.session.add(ImportRun(filename=filename[:255] if filename else None, **fields))
+    db.session.commit()
+    return result
+
+def process_sapdata_file(source, chunk_size=None, progress=None, filename=None, import_id=None):
+    """Stream an uploaded SAPDATA workbook into the database without loading it whole.
+
+    A file identical to the previous import is skipped without being parsed.
+    The outcome is stored on the ImportRun of ``import_id`` when given.
+    """
+    from importer import import_chunks
+    from excel_reader import iter_excel_chunks
+    chunk_size = chunk_size or app.config.get('IMPORT_CHUNK_SIZE', 5000)
     try:
-        logging.debug(f"📊 Excel Columns Found: {df.columns.tolist()}")
-
-        column_mappings = {
-            'job_number': ['Order', 'ORDER', 'Job'],
-            'work_order_number': ['Order', 'ORDER', 'Work Order'],
-            'operation_number': ['Oper./Act.', 'OPERATION', 'Operation'],
-            'work_center': ['Oper.WorkCenter', 'WORK_CENTER', 'Work Center'],
-            'planned_hours': ['Work', 'PLANNED_HOURS', 'Planned Hours'],
-            'actual_hours': ['Actual work', 'ACTUAL_HOURS', 'Actual Hours'],
-        }
-
-        for _, row in df.iterrows():
-            try:
-                # Extract job number
-                job_number = next((str(row[col]).strip() for col in column_mappings['job_number']
-                                   if col in df.columns and pd.notna(row[col])), None)
-                if not job_number:
-                    logging.error(f"❌ Missing Job Number: {row}")
-                    continue
-
-                # Extract work order number
-                work_order_number = job_number  # Some cases work order is same as job number
-
-                # Extract operation number
-                operation_number = None
-                for col in column_mappings['operation_number']:
-                    if col in df.columns and pd.notna(row[col]):
-                        try:
-                            operation_number = int(float(str(row[col]).strip()))
-                            break
-                        except ValueError:
-                            logging.error(f"❌ Invalid Operation Number: {row[col]}")
-                            continue
-                if operation_number is None:
-                    logging.error(f"❌ Missing Operation Number: {row}")
-                    continue
-
-                # Extract work center
-                work_center = next((str(row[col]).strip() for col in column_mappings['work_center']
-                                    if col in df.columns and pd.notna(row[col])), None)
-                if not work_center:
-                    logging.error(f"❌ Missing Work Center: {row}")
-                    continue
-
-                # Extract planned & actual hours
-                planned_hours = next((float(row[col]) for col in column_mappings['planned_hours']
-                                      if col in df.columns and pd.notna(row[col])), 0)
-                actual_hours = next((float(row[col]) for col in column_mappings['actual_hours']
-                                     if col in df.columns and pd.notna(row[col])), 0)
-
-                # ✅ **Fix: Check if Job exists before inserting**
-                job = Job.query.filter_by(job_number=job_number).first()
-                if not job:
-                    job = Job(job_number=job_number)
-                    db.session.add(job)
-                    db.session.commit()
-                    logging.info(f"✅ Created New Job: {job_number}")
-
-                # ✅ **Fix: Check if Work Order exists before inserting**
-                work_order = WorkOrder.query.filter_by(
-                    work_order_number=work_order_number,
-                    job_id=job.id  # Ensure correct Job ID
-                ).first()
-
-                if not work_order:
-                    work_order = WorkOrder(
-                        work_order_number=work_order_number,
-                        job_id=job.id
-                    )
-                    db.session.add(work_order)
-                    db.session.commit()
-                    logging.info(f"✅ Created New Work Order: {work_order_number}")
-                else:
-                    logging.info(f"🔄 Work Order {work_order_number} already exists, skipping insertion.")
-
-                # ✅ **Fix: Check if Operation exists before inserting**
-                operation = Operation.query.filter_by(
-                    work_order_id=work_order.id,
-                    operation_number=operation_number
-                ).first()
-
-                if not operation:
-                    operation = Operation(
-                        operation_number=operation_number,
-                        work_order_id=work_order.id,
-                        work_center=work_center,
-                        planned_hours=planned_hours,
-                        actual_hours=actual_hours,
-                        status='Not Started'
-                    )
-                    db.session.add(operation)
-                    logging.info(f"✅ Created New Operation: {operation_number} for Work Order {work_order_number}")
-                else:
-                    operation.planned_hours = planned_hours
-                    operation.actual_hours = actual_hours
-                    logging.info(f"🔄 Updated Operation: {operation_number}")
-
-                db.session.commit()
-
-            except Exception as e:
-                db.session.rollback()
-                logging.error(f"❌ Error Processing Row: {row.to_dict() if hasattr(row, 'to_dict') else row}")
-                logging.error(f"❌ Error Details: {str(e)}")
-                continue
+        digest = file_hash(source)
+        previous = _previous_import(digest, filename or 'Upload')
+        if previous:
+            return _record_import(filename, digest, previous, import_id) if import_id else previous
 
+        result = import_chunks(iter_excel_chunks(source, chunk_size), chunk_size=chunk_size, progress=progress)
+        return _record_import(filename, digest, result, import_id)
     except Exception as e:
         db.session.rollback()
         logging.error(f"❌ Fatal Error Processing SAPDATA: {str(e)}")
         raise
 
+def process_sapdata_batch(workbooks, progress=None, processes=None, import_id=None):
+    """Import several SAPDATA workbooks, every sheet of each, as one export.
+
+    ``workbooks`` lists ``(path, name)`` in upload order. Sheets are parsed
+    and normalized in parallel processes, merged (later sheets win duplicate
+    keys) and written in one bulk phase. A batch identical to the previous
+    import, file for file, is skipped.
+    """
+    from batch_import import merge_sheets, parse_workbooks
+    from importer import import_batches
+    try:
+        digests = []
+        for path, _ in workbooks:
+            with open(path, 'rb') as f:
+                digests.append(file_hash(f))
+        digest = hashlib.sha256(''.join(digests).encode()).hexdigest() if len(digests) > 1 else digests[0]
+        filename = ', '.join(name for _, name in workbooks)
+        previous = _previous_import(digest, filename)
+        if previous:
+            return _record_import(filename, digest, previous, import_id) if import_id else previous
+
+        batch = merge_sheets(parse_workbooks(workbooks, processes=processes))
+        result = import_batches([batch], progress=progress)
+        return _record_import(filename, digest, result, import_id)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"❌ Fatal Error Processing SAPDATA batch: {str(e)}")
+        raise
+
 def calculate_forecast(operations):
     """Calculate forecasted hours based on historical data and current trends"""
     if not operations:
         return 0
 
-    completed_ops = [op for op in operations if op.status == 'Completed']
-    if not completed_ops:
-        return sum(op.planned_hours for op in operations)
-
-    efficiency_factor = sum(op.actual_hours for op in completed_ops) / sum(op.planned_hours for op in completed_ops)
-    remaining_ops = [op for op in operations if op.status != 'Completed']
+    from forecasting import forecast_hours
+    return forecast_hours([op.planned_hours for op in operations],
+                          [op.actual_hours or 0 for op in operations],
+                          [op.status == 'Completed' for op in operations])
 
-    forecasted_hours = sum(op.planned_hours * efficiency_factor for op in remaining_ops)
-    return round(forecasted_hours, 2)
\ No newline at end of file
+def forecast_from_totals(totals):
+    """calculate_forecast() computed from a work center's aggregated totals"""
+    if not totals['count']:
+        return 0
+    if not totals['completed_count']:
+        return totals['planned']
+
+    # Completed operations planned at 0 hours give no efficiency to go by
+    efficiency_factor = (totals['completed_actual'] / totals['completed_planned']
+                         if totals['completed_planned'] else 1.0)
+    forecasted_hours = totals['remaining_planned'] * efficiency_factor
+    return round(forecasted_hours, 2)
+
+def forecast_row(totals):
+    """A work center's /api/forecast entry from its rollup totals"""
+    return {
+        "planned": totals['planned'],
+        "actual": totals['actual'],
+        "forecasted": forecast_from_totals(totals),
+        "remaining": totals['planned'] - totals['actual']
+    }
+
+def work_center_row(totals):
+    """A work center's /api/work_centers entry from its rollup totals"""
+    total_planned = totals['planned'] or 1
+    efficiency = round((totals['actual'] / total_planned) * 100)
+    return {
+        "available_work": totals['ready_count'],
+        "backlog": totals['not_started_count'],
+        "efficiency": f"{efficiency}%"
+    }